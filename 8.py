@@ -5,21 +5,70 @@
 
 Настрой:
 - INPUT_CSV: путь к файлу
+- MEDOID_MEMORY_BYTES: бюджет памяти на блок при поиске медоида
+- MEDOID_ENGINE: "grid" (отсечение кандидатов по сетке) или "brute"
+- K_SWEEP: диапазон K для автоматического выбора (иначе используется K)
+- MODE: "kmeans" (всё в памяти), "minibatch" (потоково из memory-map кэша,
+  медоиды — лучший из MEDOID_CANDIDATES кандидатов на кластер)
+  или "kmedoids" (медоиды напрямую: FastPAM / CLARA)
+- SAVE_MODEL / MODEL_PATH: сохранение обученной модели (.npz)
+- ASSIGN_CSV: разметить новые точки сохранённой моделью вместо обучения
+- APPEND_CSV: добавить пачку точек к сохранённой модели (центры не меняются) и
+  вывести новые медоиды; точки кластеров и их суммы расстояний хранятся в MODEL_PATH
+- USE_CACHE: хранить разобранные точки в <CSV>.points.npy (сбрасывается при изменении CSV)
 """
 
 from pathlib import Path
-from typing import List, Tuple, Optional
+from typing import Iterator, List, Tuple, Optional
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
 import csv
+import io
+import json
+import os
+import time
+import warnings
 
 import numpy as np
-from sklearn.cluster import KMeans
+from sklearn.cluster import KMeans, MiniBatchKMeans
+from sklearn.metrics import adjusted_rand_score, silhouette_score
+from threadpoolctl import threadpool_limits
 
 
 # ====== НАСТРОЙКИ ======
 INPUT_CSV = Path("27_B_17834.csv")   # <-- укажи свой путь
 K = 3
 SEED = 42
+MODE = "kmeans"          # "kmeans" — KMeans по всем точкам в памяти; "minibatch" — потоково по блокам;
+                         # "kmedoids" — сразу медоиды (FastPAM, для больших данных CLARA)
+N_INIT = 50
+CHUNK_ROWS = 100_000     # размер блока точек в режиме "minibatch"
+MINIBATCH_EPOCHS = 3     # проходов partial_fit по данным в режиме "minibatch"
+MEDOID_CANDIDATES = 500  # "minibatch": кандидатов в медоиды на кластер от каждого отбора (ближайшие к центру
+                         # и случайные); кластер не больше этого — медоид точный
+RUN_BENCHMARK = False    # сравнить скорость и результат "kmeans" и "minibatch"
+K_SWEEP = None           # например range(2, 11): перебрать K параллельно и взять лучший по silhouette
+                         # (в режиме "minibatch" — по случайной выборке из CHUNK_ROWS точек)
+SWEEP_WORKERS = None     # процессов для перебора K (None — по числу ядер)
+SILHOUETTE_SAMPLE = 10_000
+PAM_MAX_POINTS = 5_000   # "kmedoids": до этого размера FastPAM по всем точкам, дальше CLARA
+PAM_MAX_ITER = 100
+CLARA_SAMPLES = 5
+CLARA_SAMPLE_SIZE = 2_000
+SAVE_MODEL = False                    # True — сохранить центры/медоиды в MODEL_PATH (нужно для ASSIGN_CSV/APPEND_CSV)
+MODEL_PATH = Path("8_model.npz")
+ASSIGN_CSV = None                     # Path с новыми точками: только разметка по MODEL_PATH, без обучения
+APPEND_CSV = None                     # Path с пачкой новых точек: добавить к модели MODEL_PATH и вывести медоиды
 SORT_OUTPUT_BY_MEDOID = True
+MEDOID_MEMORY_BYTES = 256 * 1024 * 1024   # бюджет памяти на блок матрицы расстояний
+MEDOID_ENGINE = "grid"                    # "grid" — точный поиск с отсечением по сетке, "brute" — перебор
+GRID_MIN_POINTS = 256                     # меньшие кластеры считаются перебором
+GRID_MAX_CELLS_PER_AXIS = 64
+GRID_EXACT_BATCH = 64                     # кандидатов на один блок точных сумм
+USE_CACHE = True                          # кэш точек <CSV>.points.npy рядом с файлом
+PARSE_CHUNK_BYTES = 16 * 1024 * 1024      # размер блока при векторном разборе CSV
+SNIFF_LINES = 30                          # сколько непустых строк смотреть при определении формата
+SNIFF_BYTES = 64 * 1024                   # начальный размер читаемого префикса файла
 # =======================
 
 
@@ -82,13 +131,33 @@ def _try_parse_rows(sample_lines: List[str], delimiter: str) -> Tuple[int, bool,
     return score, False, None, None
 
 
+def _read_head_lines(path: Path, n_lines: int, head_bytes: int = SNIFF_BYTES) -> List[str]:
+    """
+    Первые n_lines непустых строк файла, прочитанные из ограниченного префикса.
+    Последняя строка префикса может быть обрезана — она отбрасывается;
+    если полных строк не хватило, префикс удваивается (до конца файла).
+    """
+    with path.open("rb") as f:
+        while True:
+            f.seek(0)
+            head = f.read(head_bytes)
+            at_eof = len(head) < head_bytes or not f.read(1)
+            if not at_eof:
+                # режем по последнему '\n': заодно не рвём многобайтовый символ UTF-8
+                head = head[:head.rfind(b"\n") + 1]
+            lines = head.decode("utf-8-sig").splitlines()
+            sample = [ln for ln in lines if ln.strip()][:n_lines]
+            if at_eof or len(sample) >= n_lines:
+                return sample
+            head_bytes *= 2
+
+
 def detect_csv_format(path: Path) -> Tuple[str, bool, Optional[int], Optional[int]]:
     """
     Выбирает разделитель по реальной распарсиваемости чисел.
     При равенстве баллов приоритет: ';' затем ',' затем '\\t'
     """
-    lines = path.read_text(encoding="utf-8-sig").splitlines()
-    sample = [ln for ln in lines if ln.strip()][:30]
+    sample = _read_head_lines(path, SNIFF_LINES)
     if not sample:
         raise ValueError("CSV пустой.")
 
@@ -116,21 +185,110 @@ def detect_csv_format(path: Path) -> Tuple[str, bool, Optional[int], Optional[in
     return delimiter, has_header, ix, iy
 
 
-def load_points_csv(path: Path) -> np.ndarray:
+def _cache_paths(path: Path) -> Tuple[Path, Path]:
+    return path.with_name(path.name + ".points.npy"), path.with_name(path.name + ".points.json")
+
+
+def _source_key(path: Path) -> dict:
+    st = path.stat()
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+
+def _load_cache(path: Path) -> Optional[np.ndarray]:
+    """
+    Точки из бинарного кэша рядом с CSV (memory-map), если CSV с тех пор
+    не менялся (размер и mtime совпадают). Иначе None.
+    """
+    npy_path, meta_path = _cache_paths(path)
+    if not (npy_path.exists() and meta_path.exists()):
+        return None
+    try:
+        meta = json.loads(meta_path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    if meta != _source_key(path):
+        return None
+    return np.load(npy_path, mmap_mode="r")
+
+
+def _save_cache(path: Path, pts: np.ndarray, key: dict) -> None:
+    """Записывает кэш точек; key — размер/mtime CSV, снятые до разбора."""
+    npy_path, meta_path = _cache_paths(path)
+    tmp = npy_path.with_name(npy_path.name + ".tmp")
+    try:
+        with tmp.open("wb") as f:
+            np.save(f, np.ascontiguousarray(pts, dtype=float))
+        os.replace(tmp, npy_path)
+    finally:
+        tmp.unlink(missing_ok=True)
+    meta_path.write_text(json.dumps(key), encoding="utf-8")
+
+
+def _parse_rows(lines: List[str], delimiter: str, has_header: bool, ix: int, iy: int,
+                start_line_no: int) -> np.ndarray:
+    """Построчный разбор (медленный путь) с точными сообщениями об ошибках."""
+    pts: List[Tuple[float, float]] = []
+    reader = csv.reader(lines, delimiter=delimiter)
+    for line_no, row in enumerate(reader, start=start_line_no):
+        if not row or all(_clean_cell(c) == "" for c in row):
+            continue
+
+        if has_header:
+            if len(row) <= max(ix, iy):
+                raise ValueError(f"Строка {line_no}: не хватает столбцов: {row}")
+            try:
+                x = _to_float(row[ix])
+                y = _to_float(row[iy])
+            except Exception as e:
+                raise ValueError(f"Строка {line_no}: не удалось прочитать x/y: {row}") from e
+        else:
+            if len(row) < 2:
+                raise ValueError(f"Строка {line_no}: нужно минимум 2 столбца: {row}")
+            try:
+                x = _to_float(row[0])
+                y = _to_float(row[1])
+            except Exception as e:
+                raise ValueError(f"Строка {line_no}: не удалось прочитать числа: {row}") from e
+
+        pts.append((x, y))
+
+    return np.array(pts, dtype=float).reshape(-1, 2)
+
+
+def _parse_block(text: str, delimiter: str, has_header: bool, ix: int, iy: int,
+                 start_line_no: int) -> np.ndarray:
+    """
+    Векторный разбор блока целых строк сразу в массив (n, 2).
+    При разделителе ';' или '\t' десятичная запятая заменяется на точку
+    во всём блоке одной операцией. Если блок не читается целиком
+    (пустые ячейки, запятая в кавычках и т.п.) — построчный разбор.
+    """
+    cols = (ix, iy) if has_header else (0, 1)
+    fast_text = text if delimiter == "," else text.replace(",", ".")
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", UserWarning)  # блок из одних пустых строк
+            return np.loadtxt(io.StringIO(fast_text), delimiter=delimiter, usecols=cols,
+                              quotechar='"', comments=None, dtype=float, ndmin=2)
+    except ValueError:
+        return _parse_rows(text.splitlines(), delimiter, has_header, ix, iy, start_line_no)
+
+
+def iter_points_csv(path: Path, chunk_bytes: int = PARSE_CHUNK_BYTES) -> Iterator[np.ndarray]:
+    """
+    Читает CSV блоками по ~chunk_bytes символов и отдаёт массивы точек (n, 2).
+    Разделитель и индексы x/y берутся из detect_csv_format.
+    """
     if not path.exists():
         raise FileNotFoundError(f"Файл не найден: {path.resolve()}")
 
     delimiter, has_header_hint, ix_hint, iy_hint = detect_csv_format(path)
 
-    pts: List[Tuple[float, float]] = []
     with path.open("r", encoding="utf-8-sig", newline="") as f:
-        reader = csv.reader(f, delimiter=delimiter)
-
-        try:
-            first_row_raw = next(reader)
-        except StopIteration:
+        first_line = f.readline()
+        if not first_line:
             raise ValueError("CSV пустой.")
-
+        first_row_raw = next(csv.reader([first_line], delimiter=delimiter), [])
         first_row = [_clean_cell(c) for c in first_row_raw]
 
         # финальная проверка заголовка
@@ -140,15 +298,14 @@ def load_points_csv(path: Path) -> np.ndarray:
         if has_header:
             ix = lower.index("x")
             iy = lower.index("y")
-            start_line_no = 2
         elif has_header_hint and ix_hint is not None and iy_hint is not None:
             # если в сэмпле нашли заголовок, но здесь не нашли из-за пробелов/вариантов,
             # используем подсказку
             ix, iy = ix_hint, iy_hint
             has_header = True
-            start_line_no = 2
         else:
             # первая строка — данные
+            ix, iy = 0, 1
             if len(first_row) < 2:
                 raise ValueError(f"Первая строка слишком короткая: {first_row_raw}")
             try:
@@ -156,58 +313,682 @@ def load_points_csv(path: Path) -> np.ndarray:
                 y0 = _to_float(first_row[1])
             except Exception as e:
                 raise ValueError(f"Первая строка не распознана как данные: {first_row}") from e
-            pts.append((x0, y0))
-            start_line_no = 2
+            yield np.array([[x0, y0]], dtype=float)
 
-        # читаем остальное
-        for line_no, row in enumerate(reader, start=start_line_no):
-            if not row or all(_clean_cell(c) == "" for c in row):
+        # читаем остальное блоками целых строк
+        line_no = 2
+        tail = ""
+        while True:
+            block = f.read(chunk_bytes)
+            if not block:
+                break
+            block = tail + block
+            cut = block.rfind("\n") + 1
+            if cut == 0:
+                tail = block
                 continue
+            block, tail = block[:cut], block[cut:]
+            pts = _parse_block(block, delimiter, has_header, ix, iy, line_no)
+            line_no += block.count("\n")
+            if pts.shape[0]:
+                yield pts
+        if tail:
+            pts = _parse_block(tail, delimiter, has_header, ix, iy, line_no)
+            if pts.shape[0]:
+                yield pts
+
 
-            if has_header:
-                if len(row) <= max(ix, iy):
-                    raise ValueError(f"Строка {line_no}: не хватает столбцов: {row}")
-                try:
-                    x = _to_float(row[ix])
-                    y = _to_float(row[iy])
-                except Exception as e:
-                    raise ValueError(f"Строка {line_no}: не удалось прочитать x/y: {row}") from e
-            else:
-                if len(row) < 2:
-                    raise ValueError(f"Строка {line_no}: нужно минимум 2 столбца: {row}")
-                try:
-                    x = _to_float(row[0])
-                    y = _to_float(row[1])
-                except Exception as e:
-                    raise ValueError(f"Строка {line_no}: не удалось прочитать числа: {row}") from e
-
-            pts.append((x, y))
-
-    if not pts:
+def load_points_csv(path: Path, use_cache: bool = USE_CACHE) -> np.ndarray:
+    """
+    Все точки CSV одним массивом (n, 2).
+    С use_cache результат сохраняется в <имя>.points.npy и при повторном
+    запуске (CSV не менялся) открывается через memory-map без разбора.
+    """
+    if not path.exists():
+        raise FileNotFoundError(f"Файл не найден: {path.resolve()}")
+
+    if use_cache:
+        cached = _load_cache(path)
+        if cached is not None:
+            return cached
+
+    key = _source_key(path)
+    chunks = list(iter_points_csv(path))
+    if not chunks:
         raise ValueError("В CSV нет точек.")
+    pts = np.concatenate(chunks) if len(chunks) > 1 else chunks[0]
+
+    # CSV переписали во время разбора — точки уже не соответствуют файлу, кэш не пишем
+    if use_cache and _source_key(path) == key:
+        try:
+            _save_cache(path, pts, key)
+        except OSError as e:
+            # кэш — только ускорение: каталог только для чтения не повод падать
+            warnings.warn(f"Кэш точек не записан ({e}); работаем без него.")
+    return pts
 
-    return np.array(pts, dtype=float)
 
+def open_points_mmap(path: Path, chunk_bytes: int = PARSE_CHUNK_BYTES) -> np.ndarray:
+    """
+    Точки как memory-map из кэша <имя>.points.npy.
+    Если кэша нет или он устарел — CSV разбирается потоково во временный
+    файл, так что в памяти одновременно только один блок.
+    """
+    if not path.exists():
+        raise FileNotFoundError(f"Файл не найден: {path.resolve()}")
 
-def medoid(points: np.ndarray) -> np.ndarray:
-    diffs = points[:, None, :] - points[None, :, :]  # (m, m, 2)
-    dists = np.sqrt((diffs ** 2).sum(axis=2))        # (m, m)
-    sums = dists.sum(axis=1)                         # (m,)
-    return points[int(np.argmin(sums))]
+    cached = _load_cache(path)
+    if cached is not None:
+        return cached
 
+    key = _source_key(path)
+    npy_path, _ = _cache_paths(path)
+    raw_path = npy_path.with_name(npy_path.name + ".raw")
+    n = 0
+    try:
+        with raw_path.open("wb") as f:
+            for chunk in iter_points_csv(path, chunk_bytes):
+                f.write(np.ascontiguousarray(chunk, dtype=float).tobytes())
+                n += chunk.shape[0]
+        if n == 0:
+            raise ValueError("В CSV нет точек.")
+        raw = np.memmap(raw_path, dtype=float, mode="r", shape=(n, 2))
+        # ключ снят до разбора: если CSV успел измениться, этот кэш не совпадёт при следующем запуске
+        _save_cache(path, raw, key)
+        del raw
+    finally:
+        raw_path.unlink(missing_ok=True)
 
-def main() -> None:
-    pts = load_points_csv(INPUT_CSV)
+    return np.load(npy_path, mmap_mode="r")
+
+
+def _pairwise_dists(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    diffs = a[:, None, :] - b[None, :, :]            # (n, m, d)
+    return np.sqrt((diffs ** 2).sum(axis=2))         # (n, m)
+
+
+def _row_block(m: int, dim: int, memory_bytes: int, live: int = 1) -> int:
+    """
+    Сколько строк матрицы расстояний (до m точек) помещается в бюджет памяти.
+    На строку уходят разности (m, d), их квадраты (m, d) и расстояния (m,);
+    live — сколько массивов (m,) на строку живут одновременно после подсчёта
+    расстояний (сами расстояния и временные массивы вызывающего кода).
+    """
+    per_row = max(1, m) * 8 * max(2 * dim + 1, live)
+    return max(1, int(memory_bytes // per_row))
+
+
+def _distance_sums(queries: np.ndarray, points: np.ndarray,
+                   memory_bytes: int = MEDOID_MEMORY_BYTES) -> np.ndarray:
+    """
+    Для каждой точки queries — сумма расстояний до всех points.
+    Считается блоками строк: в памяти одновременно только (block, m) расстояний.
+    """
+    sums = np.empty(queries.shape[0], dtype=float)
+    block = _row_block(points.shape[0], points.shape[1], memory_bytes)
+    for start in range(0, queries.shape[0], block):
+        stop = start + block
+        sums[start:stop] = _pairwise_dists(queries[start:stop], points).sum(axis=1)
+    return sums
+
+
+def _medoid_grid(points: np.ndarray, memory_bytes: int) -> int:
+    """
+    Индекс точного медоида 2-D точек с отсечением по равномерной сетке.
+    Для каждой ячейки c известны число точек n_c, центр масс mu_c и
+    bounding box; сумма расстояний от p до точек ячейки не меньше и
+    n_c * |p - mu_c| (выпуклость нормы), и n_c * dist(p, box_c).
+    Сумма этих границ по ячейкам — нижняя граница полной суммы точки p.
+    Ячейки и точки просматриваются по возрастанию границы; полная сумма
+    считается только для тех, чья граница не хуже текущего лучшего.
+    """
+    m, dim = points.shape
+    g = int(min(GRID_MAX_CELLS_PER_AXIS, max(1, round(m ** 0.4))))
+    lo = points.min(axis=0)
+    span = points.max(axis=0) - lo
+    span[span == 0] = 1.0
+    cell_xy = np.minimum(((points - lo) / span * g).astype(np.int64), g - 1)
+    cell_id = cell_xy[:, 0] * g + cell_xy[:, 1]
+
+    order = np.argsort(cell_id, kind="stable")
+    _, starts, counts = np.unique(cell_id[order], return_index=True, return_counts=True)
+    sorted_pts = points[order]
+    box_lo = np.minimum.reduceat(sorted_pts, starts, axis=0)
+    box_hi = np.maximum.reduceat(sorted_pts, starts, axis=0)
+    weights = counts.astype(float)
+    centers = np.add.reduceat(sorted_pts, starts, axis=0) / weights[:, None]
+
+    def lower_bounds(q_lo: np.ndarray, q_hi: np.ndarray) -> np.ndarray:
+        # граница для прямоугольников [q_lo, q_hi]; для точки q_lo == q_hi
+        out = np.empty(q_lo.shape[0], dtype=float)
+        block = _row_block(box_lo.shape[0], 2 * dim, memory_bytes)
+        for start in range(0, q_lo.shape[0], block):
+            stop = start + block
+            ql, qh = q_lo[start:stop, None, :], q_hi[start:stop, None, :]
+            # зазоры считаются на месте: одновременно живут не больше двух массивов (b, cells, d)
+            gap = box_lo[None, :, :] - qh
+            np.maximum(gap, ql - box_hi[None, :, :], out=gap)
+            np.maximum(gap, 0.0, out=gap)
+            np.square(gap, out=gap)
+            dist = gap.sum(axis=2)
+            np.subtract(centers[None, :, :], qh, out=gap)
+            np.maximum(gap, ql - centers[None, :, :], out=gap)
+            np.maximum(gap, 0.0, out=gap)
+            np.square(gap, out=gap)
+            np.maximum(dist, gap.sum(axis=2), out=dist)
+            del gap
+            out[start:stop] = np.sqrt(dist, out=dist) @ weights
+            del dist
+        return out
+
+    cell_lb = lower_bounds(box_lo, box_hi)
+
+    # стартовый кандидат — точка, ближайшая к покоординатной медиане
+    best_idx = int(np.argmin(((points - np.median(points, axis=0)) ** 2).sum(axis=1)))
+    best_sum = float(_distance_sums(points[best_idx:best_idx + 1], points, memory_bytes)[0])
+    slack = 1.0 + 1e-9  # запас на погрешность округления границ
+
+    for c in np.argsort(cell_lb, kind="stable"):
+        if cell_lb[c] > best_sum * slack:
+            break
+        idx = order[starts[c]:starts[c] + counts[c]]
+        cand = points[idx]
+        lb = lower_bounds(cand, cand)
+        # сначала самые перспективные: быстрее опускается best_sum
+        rank = np.argsort(lb, kind="stable")
+        idx, lb = idx[rank], lb[rank]
+        for start in range(0, idx.size, GRID_EXACT_BATCH):
+            stop = start + GRID_EXACT_BATCH
+            part = idx[start:stop][lb[start:stop] <= best_sum * slack]
+            if part.size == 0:
+                break
+            sums = _distance_sums(points[part], points, memory_bytes)
+            s_min = sums.min()
+            i_min = int(part[sums == s_min].min())  # при равенстве — меньший индекс, как у argmin
+            if s_min < best_sum or (s_min == best_sum and i_min < best_idx):
+                best_sum, best_idx = float(s_min), i_min
+
+    return best_idx
+
+
+def _medoid_index(points: np.ndarray, memory_bytes: int, engine: str) -> int:
+    if engine == "grid" and points.shape[1] == 2 and points.shape[0] > GRID_MIN_POINTS:
+        return _medoid_grid(points, memory_bytes)
+    if engine not in ("brute", "grid"):
+        raise ValueError(f"Неизвестный движок медоида: {engine!r}")
+    return int(np.argmin(_distance_sums(points, points, memory_bytes)))
+
+
+def medoid(points: np.ndarray, memory_bytes: int = MEDOID_MEMORY_BYTES,
+           engine: str = MEDOID_ENGINE) -> np.ndarray:
+    """
+    Точный медоид: точка с минимальной суммой расстояний до остальных.
+    Полная матрица (m, m) не строится — суммы копятся по блокам строк,
+    поэтому память ~ memory_bytes + O(m) при любом размере кластера.
+
+    engine: "brute" — все m^2 расстояний; "grid" — отсечение кандидатов
+    по сетке (только 2-D, для малых кластеров используется "brute").
+    Оба движка возвращают одну и ту же точку.
+    """
+    points = np.asarray(points, dtype=float)
+    if points.shape[0] == 0:
+        raise ValueError("Пустой кластер: медоид не определён.")
+    return points[_medoid_index(points, memory_bytes, engine)]
+
+
+def benchmark_medoid(sizes: Tuple[int, ...] = (2_000, 5_000, 20_000), seed: int = SEED) -> None:
+    """Сравнение движков медоида на синтетическом скоплении (смесь гауссовых сгустков)."""
+    rng = np.random.default_rng(seed)
+    print("Бенчмарк медоида. Формат: m | brute, с | grid, с | ускорение | совпадение")
+    for m in sizes:
+        centers = rng.normal(scale=3.0, size=(5, 2))
+        pts = centers[rng.integers(0, 5, size=m)] + rng.normal(size=(m, 2))
+
+        t0 = time.perf_counter()
+        a = medoid(pts, engine="brute")
+        t_brute = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        b = medoid(pts, engine="grid")
+        t_grid = time.perf_counter() - t0
+
+        print(f"{m:>7} | {t_brute:>8.3f} | {t_grid:>7.3f} | {t_brute / t_grid:>8.1f}x | {np.array_equal(a, b)}")
+
+
+class IncrementalCluster:
+    """
+    Кластер, который хранит для каждой точки сумму расстояний до остальных
+    точек кластера. add/remove пересчитывают суммы за O(m·b) для пачки из b
+    точек, поэтому медоид после каждой пачки берётся сразу как argmin сумм.
+
+    Суммы копятся инкрементно, и ошибки округления могут накапливаться.
+    recompute() пересчитывает суммы с нуля.
+    """
+
+    def __init__(self, points: Optional[np.ndarray] = None,
+                 memory_bytes: int = MEDOID_MEMORY_BYTES) -> None:
+        self.memory_bytes = memory_bytes
+        self.points = np.empty((0, 2), dtype=float)
+        self.sums = np.empty(0, dtype=float)
+        if points is not None:
+            self.add(points)
+
+    def __len__(self) -> int:
+        return self.points.shape[0]
+
+    def add(self, batch: np.ndarray) -> None:
+        batch = np.asarray(batch, dtype=float).reshape(-1, self.points.shape[1])
+        if batch.shape[0] == 0:
+            return
+        if len(self):
+            self.sums += _distance_sums(self.points, batch, self.memory_bytes)
+        self.points = np.concatenate([self.points, batch])
+        self.sums = np.concatenate([self.sums, _distance_sums(batch, self.points, self.memory_bytes)])
+
+    def remove(self, indices: np.ndarray) -> np.ndarray:
+        """Удаляет точки по индексам (в текущей нумерации) и возвращает их."""
+        keep = np.ones(len(self), dtype=bool)
+        keep[np.asarray(indices, dtype=int)] = False
+        removed = self.points[~keep]
+        self.points = self.points[keep]
+        self.sums = self.sums[keep]
+        if removed.shape[0] and len(self):
+            self.sums -= _distance_sums(self.points, removed, self.memory_bytes)
+        return removed
 
-    kmeans = KMeans(n_clusters=K, n_init=50, random_state=SEED)
-    labels = kmeans.fit_predict(pts)
+    def recompute(self) -> None:
+        self.sums = _distance_sums(self.points, self.points, self.memory_bytes)
 
-    results = []
-    for cid in range(K):
-        cpts = pts[labels == cid]
-        m = medoid(cpts)
-        results.append((cid + 1, int(cpts.shape[0]), float(m[0]), float(m[1])))
+    def medoid(self) -> np.ndarray:
+        if not len(self):
+            raise ValueError("Пустой кластер: медоид не определён.")
+        return self.points[int(np.argmin(self.sums))]
 
+
+class IncrementalClustering:
+    """
+    Набор IncrementalCluster с фиксированными центрами (например, центроидами KMeans).
+    Новые точки относятся к ближайшему центру и добавляются в его кластер —
+    без повторного чтения CSV, KMeans и полного пересчёта медоидов.
+    """
+
+    def __init__(self, pts: np.ndarray, labels: np.ndarray, centers: np.ndarray,
+                 memory_bytes: int = MEDOID_MEMORY_BYTES) -> None:
+        pts = np.asarray(pts, dtype=float)
+        self.centers = np.asarray(centers, dtype=float)
+        self.clusters = [IncrementalCluster(pts[labels == cid], memory_bytes)
+                         for cid in range(self.centers.shape[0])]
+
+    def add(self, batch: np.ndarray) -> np.ndarray:
+        """Добавляет пачку точек и возвращает их метки."""
+        batch = np.asarray(batch, dtype=float).reshape(-1, self.centers.shape[1])
+        labels = np.argmin(_pairwise_dists(batch, self.centers), axis=1)
+        for cid, cluster in enumerate(self.clusters):
+            cluster.add(batch[labels == cid])
+        return labels
+
+    def medoids(self) -> np.ndarray:
+        return np.array([c.medoid() for c in self.clusters])
+
+    def sizes(self) -> List[int]:
+        return [len(c) for c in self.clusters]
+
+    def state(self) -> dict:
+        """Массивы для сохранения (save_model): точки, их метки и суммы расстояний."""
+        return {
+            "points": np.concatenate([c.points for c in self.clusters]),
+            "labels": np.concatenate([np.full(len(c), cid) for cid, c in enumerate(self.clusters)]),
+            "sums": np.concatenate([c.sums for c in self.clusters]),
+        }
+
+    @classmethod
+    def from_state(cls, centers: np.ndarray, points: np.ndarray, labels: np.ndarray, sums: np.ndarray,
+                   memory_bytes: int = MEDOID_MEMORY_BYTES) -> "IncrementalClustering":
+        """Восстановление без пересчёта сумм (O(m^2)) — они берутся из сохранённой модели."""
+        self = cls.__new__(cls)
+        self.centers = np.asarray(centers, dtype=float)
+        self.clusters = []
+        for cid in range(self.centers.shape[0]):
+            cluster = IncrementalCluster(memory_bytes=memory_bytes)
+            cluster.points = np.asarray(points[labels == cid], dtype=float)
+            cluster.sums = np.asarray(sums[labels == cid], dtype=float)
+            self.clusters.append(cluster)
+        return self
+
+
+def fit_minibatch(pts: np.ndarray, k: int, seed: int, chunk_rows: int = CHUNK_ROWS,
+                  epochs: int = MINIBATCH_EPOCHS) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Потоковая кластеризация: MiniBatchKMeans.partial_fit по блокам pts
+    (подходит memory-map), затем отдельный проход назначения меток.
+    Начальные центры — KMeans с N_INIT перезапусками на случайной выборке
+    размером в один блок. Возвращает (labels, centers).
+    """
+    n = pts.shape[0]
+    rng = np.random.default_rng(seed)
+    starts = np.arange(0, n, chunk_rows)
+
+    sample_idx = np.sort(rng.choice(n, size=min(n, chunk_rows), replace=False))
+    init = KMeans(n_clusters=k, n_init=N_INIT, random_state=seed).fit(np.asarray(pts[sample_idx])).cluster_centers_
+
+    model = MiniBatchKMeans(n_clusters=k, init=init, n_init=1, random_state=seed, compute_labels=False)
+    for _ in range(epochs):
+        for start in rng.permutation(starts):
+            model.partial_fit(np.asarray(pts[start:start + chunk_rows], dtype=float))
+
+    labels = np.empty(n, dtype=np.int32)
+    for start in starts:
+        labels[start:start + chunk_rows] = model.predict(np.asarray(pts[start:start + chunk_rows], dtype=float))
+    return labels, model.cluster_centers_
+
+
+def _keep_smallest(keys: np.ndarray, idx: np.ndarray, h: int) -> Tuple[np.ndarray, np.ndarray]:
+    if keys.size <= h:
+        return keys, idx
+    part = np.argpartition(keys, h - 1)[:h]
+    return keys[part], idx[part]
+
+
+def medoids_streamed(pts: np.ndarray, labels: np.ndarray, centers: np.ndarray, seed: int,
+                     candidates: int = MEDOID_CANDIDATES, chunk_rows: int = CHUNK_ROWS,
+                     memory_bytes: int = MEDOID_MEMORY_BYTES) -> np.ndarray:
+    """
+    Медоиды кластеров без загрузки кластера в память (pts — memory-map).
+    Проход 1 отбирает кандидатов: candidates точек, ближайших к центру
+    кластера, и candidates случайных (наименьшие случайные ключи — равномерная
+    выборка). Проход 2 считает для кандидатов суммы расстояний до всех точек
+    кластера, блоками по chunk_rows. Медоид — кандидат с наименьшей суммой;
+    если в кластере не больше candidates точек, кандидаты — все его точки и
+    медоид точный (как у medoid()).
+    """
+    n, k = pts.shape[0], centers.shape[0]
+    rng = np.random.default_rng(seed)
+    near = [(np.empty(0), np.empty(0, dtype=np.int64)) for _ in range(k)]
+    rand = [(np.empty(0), np.empty(0, dtype=np.int64)) for _ in range(k)]
+    for start in range(0, n, chunk_rows):
+        block = np.asarray(pts[start:start + chunk_rows], dtype=float)
+        block_labels = labels[start:start + chunk_rows]
+        keys = rng.random(block.shape[0])
+        for cid in range(k):
+            sel = np.flatnonzero(block_labels == cid)
+            if not sel.size:
+                continue
+            d = np.sqrt(((block[sel] - centers[cid]) ** 2).sum(axis=1))
+            near[cid] = _keep_smallest(np.concatenate([near[cid][0], d]),
+                                       np.concatenate([near[cid][1], start + sel]), candidates)
+            rand[cid] = _keep_smallest(np.concatenate([rand[cid][0], keys[sel]]),
+                                       np.concatenate([rand[cid][1], start + sel]), candidates)
+
+    cand_idx = [np.union1d(near[cid][1], rand[cid][1]) for cid in range(k)]
+    if any(not c.size for c in cand_idx):
+        raise ValueError("Пустой кластер: медоид не определён.")
+    cand_pts = [np.asarray(pts[c], dtype=float) for c in cand_idx]
+    sums = [np.zeros(c.size) for c in cand_idx]
+    for start in range(0, n, chunk_rows):
+        block = np.asarray(pts[start:start + chunk_rows], dtype=float)
+        block_labels = labels[start:start + chunk_rows]
+        for cid in range(k):
+            members = block[block_labels == cid]
+            if members.shape[0]:
+                sums[cid] += _distance_sums(cand_pts[cid], members, memory_bytes)
+    # кандидаты по возрастанию индекса: при равенстве сумм — меньший индекс, как у argmin
+    return np.array([cand_pts[cid][int(np.argmin(sums[cid]))] for cid in range(k)])
+
+
+def benchmark_clustering(pts: np.ndarray, k: int, seed: int) -> None:
+    """Сравнение пакетного KMeans и потокового режима: время, точки/с, совпадение меток и медоидов."""
+    pts = np.asarray(pts, dtype=float)
+    n = pts.shape[0]
+
+    t0 = time.perf_counter()
+    labels_batch = KMeans(n_clusters=k, n_init=N_INIT, random_state=seed).fit_predict(pts)
+    t_batch = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    labels_stream, _ = fit_minibatch(pts, k, seed)
+    t_stream = time.perf_counter() - t0
+
+    med_batch = np.array([medoid(pts[labels_batch == c]) for c in range(k)])
+    med_stream = np.array([medoid(pts[labels_stream == c]) for c in range(k)])
+    # кластеры сопоставляем по ближайшему медоиду
+    shift = _pairwise_dists(med_batch, med_stream).min(axis=1)
+
+    print(f"Бенчмарк кластеризации: {n} точек, K={k}")
+    print(f"{'режим':>10} | {'время, с':>9} | {'точек/с':>12}")
+    print(f"{'kmeans':>10} | {t_batch:>9.3f} | {n / t_batch:>12.0f}")
+    print(f"{'minibatch':>10} | {t_stream:>9.3f} | {n / t_stream:>12.0f}")
+    print(f"ARI меток: {adjusted_rand_score(labels_batch, labels_stream):.4f}; "
+          f"макс. сдвиг медоида: {shift.max():.6f}")
+
+
+def _nearest_two(pts: np.ndarray, centers: np.ndarray,
+                 memory_bytes: int = MEDOID_MEMORY_BYTES) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Для каждой точки: индекс ближайшего центра, расстояние до него и до второго по близости."""
+    n, k = pts.shape[0], centers.shape[0]
+    nearest = np.empty(n, dtype=np.int64)
+    d1 = np.empty(n, dtype=float)
+    d2 = np.full(n, np.inf)
+    block = _row_block(k, centers.shape[1], memory_bytes)
+    for start in range(0, n, block):
+        stop = start + block
+        d = _pairwise_dists(np.asarray(pts[start:stop], dtype=float), centers)
+        nearest[start:stop] = np.argmin(d, axis=1)
+        if k > 1:
+            part = np.partition(d, 1, axis=1)
+            d1[start:stop], d2[start:stop] = part[:, 0], part[:, 1]
+        else:
+            d1[start:stop] = d[:, 0]
+    return nearest, d1, d2
+
+
+def _pam_build(pts: np.ndarray, k: int, memory_bytes: int) -> np.ndarray:
+    """Жадная инициализация PAM (BUILD): первый медоид — медоид всех точек, далее — максимальный выигрыш."""
+    n = pts.shape[0]
+    medoids = [_medoid_index(pts, memory_bytes, MEDOID_ENGINE)]
+    dn = _pairwise_dists(pts, pts[medoids]).ravel()
+    block = _row_block(n, pts.shape[1], memory_bytes)
+    for _ in range(1, k):
+        gains = np.empty(n, dtype=float)
+        for start in range(0, n, block):
+            d = _pairwise_dists(pts[start:start + block], pts)
+            np.subtract(dn[None, :], d, out=d)         # выигрыш считается на месте расстояний
+            np.maximum(d, 0.0, out=d)
+            gains[start:start + block] = d.sum(axis=1)
+            del d                                      # не держим блок, пока считается следующий
+        gains[medoids] = -np.inf
+        best = int(np.argmax(gains))
+        medoids.append(best)
+        dn = np.minimum(dn, _pairwise_dists(pts, pts[best:best + 1]).ravel())
+    return np.array(medoids, dtype=np.int64)
+
+
+def _fastpam(pts: np.ndarray, k: int, init: Optional[np.ndarray] = None,
+             max_iter: int = PAM_MAX_ITER, memory_bytes: int = MEDOID_MEMORY_BYTES) -> np.ndarray:
+    """
+    k-medoids: BUILD + обмены FastPAM1 (Schubert, Rousseeuw, 2019).
+    Для кандидата x_c изменение суммарного отклонения считается сразу для
+    всех k медоидов по расстояниям до ближайшего и второго медоида, так
+    что одна итерация стоит O(n^2), а не O(k n^2). Возвращает индексы медоидов.
+    """
+    pts = np.asarray(pts, dtype=float)
+    n = pts.shape[0]
+    medoids = _pam_build(pts, k, memory_bytes) if init is None else np.array(init, dtype=np.int64)
+    if k == 1:
+        return medoids
+
+    # в блоке живут расстояния, вклады и маска (b, n)
+    block = _row_block(n, pts.shape[1], memory_bytes, live=3)
+    for _ in range(max_iter):
+        nearest, dn, ds = _nearest_two(pts, pts[medoids], memory_bytes)
+        removal = np.bincount(nearest, weights=ds - dn, minlength=k)  # потеря от удаления медоида i
+        onehot = np.zeros((n, k))
+        onehot[np.arange(n), nearest] = 1.0
+        is_medoid = np.zeros(n, dtype=bool)
+        is_medoid[medoids] = True
+
+        best_delta, best_c, best_i = -1e-12, -1, -1
+        for start in range(0, n, block):
+            d = _pairwise_dists(pts[start:start + block], pts)            # (b, n)
+            # вклад точки o: dn - ds, если x_c ближе её медоида; d - ds, если ближе второго; иначе 0
+            contrib = d - ds[None, :]
+            np.minimum(contrib, 0.0, out=contrib)
+            closer = d < dn[None, :]
+            np.copyto(contrib, (dn - ds)[None, :], where=closer)
+            del closer
+            np.subtract(d, dn[None, :], out=d)
+            np.minimum(d, 0.0, out=d)
+            shared = d.sum(axis=1)                                        # выигрыш, общий для всех i
+            delta = removal[None, :] + contrib @ onehot + shared[:, None]  # (b, k)
+            del d, contrib
+            delta[is_medoid[start:start + block]] = np.inf
+            j = int(np.argmin(delta))
+            r, i = divmod(j, k)
+            if delta[r, i] < best_delta:
+                best_delta, best_c, best_i = float(delta[r, i]), start + r, i
+
+        if best_c < 0:
+            break
+        medoids[best_i] = best_c
+    return medoids
+
+
+def _clara(pts: np.ndarray, k: int, seed: int, samples: int = CLARA_SAMPLES,
+           sample_size: int = CLARA_SAMPLE_SIZE) -> np.ndarray:
+    """
+    CLARA: FastPAM на случайных выборках, качество — суммарное отклонение
+    по всем точкам (потоково, подходит memory-map). Лучшие медоиды
+    добавляются в каждую следующую выборку.
+    """
+    n = pts.shape[0]
+    rng = np.random.default_rng(seed)
+    best, best_cost = None, np.inf
+    for _ in range(samples):
+        idx = rng.choice(n, size=min(n, sample_size), replace=False)
+        if best is not None:
+            idx = np.union1d(idx, best)
+        idx = np.sort(idx)
+        init = None if best is None else np.searchsorted(idx, best)
+        cand = idx[_fastpam(np.asarray(pts[idx], dtype=float), k, init=init)]
+        cost = float(_nearest_two(pts, np.asarray(pts[cand], dtype=float))[1].sum())
+        if cost < best_cost:
+            best, best_cost = cand, cost
+    return best
+
+
+def fit_kmedoids(pts: np.ndarray, k: int, seed: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Кластеризация сразу по медоидам: FastPAM для n <= PAM_MAX_POINTS,
+    иначе CLARA. Возвращает (labels, medoids) — медоиды в порядке меток.
+    """
+    if pts.shape[0] <= PAM_MAX_POINTS:
+        idx = _fastpam(np.asarray(pts, dtype=float), k)
+    else:
+        idx = _clara(pts, k, seed)
+    medoids = np.asarray(pts[idx], dtype=float)
+    labels = _nearest_two(pts, medoids)[0]
+    return labels, medoids
+
+
+_SWEEP_SHM: Optional[shared_memory.SharedMemory] = None
+_SWEEP_POINTS: Optional[np.ndarray] = None
+
+
+def _sweep_init(shm_name: str, shape: Tuple[int, int]) -> None:
+    """Инициализатор процесса пула: точки берутся из общей памяти без копирования."""
+    global _SWEEP_SHM, _SWEEP_POINTS
+    _SWEEP_SHM = shared_memory.SharedMemory(name=shm_name)
+    _SWEEP_POINTS = np.ndarray(shape, dtype=float, buffer=_SWEEP_SHM.buf)
+
+
+def _sweep_fit(k: int, seed: int, n_init: int, sample: int) -> Tuple[int, float, float]:
+    pts = _SWEEP_POINTS
+    # процессов уже столько, сколько ядер: внутренние потоки BLAS/OpenMP не нужны
+    with threadpool_limits(1):
+        km = KMeans(n_clusters=k, n_init=n_init, random_state=seed).fit(pts)
+        sil = silhouette_score(pts, km.labels_, sample_size=min(sample, pts.shape[0]), random_state=seed)
+    return k, float(km.inertia_), float(sil)
+
+
+def sweep_k(pts: np.ndarray, ks: List[int], seed: int, n_init: int = N_INIT,
+            workers: Optional[int] = SWEEP_WORKERS,
+            sample: int = SILHOUETTE_SAMPLE) -> List[Tuple[int, float, float]]:
+    """
+    Перебор K в пуле процессов. Массив точек один раз кладётся в shared memory,
+    процессы читают его напрямую (без pickle копии на каждую задачу).
+    Возвращает [(K, inertia, silhouette по выборке из sample точек)].
+    """
+    # silhouette определён только для 2 <= K <= n - 1 — проверяем до запуска пула
+    bad = [k for k in ks if not 2 <= k < min(sample, pts.shape[0])]
+    if bad:
+        raise ValueError(f"K_SWEEP: silhouette не определён для K={bad} "
+                         f"(нужно 2 <= K < {min(sample, pts.shape[0])}).")
+    pts = np.asarray(pts, dtype=float)
+    shm = shared_memory.SharedMemory(create=True, size=pts.nbytes)
+    try:
+        np.ndarray(pts.shape, dtype=float, buffer=shm.buf)[:] = pts
+        n = len(ks)
+        with ProcessPoolExecutor(max_workers=workers or min(n, os.cpu_count() or 1),
+                                 initializer=_sweep_init, initargs=(shm.name, pts.shape)) as ex:
+            results = list(ex.map(_sweep_fit, ks, [seed] * n, [n_init] * n, [sample] * n))
+    finally:
+        shm.close()
+        shm.unlink()
+    return results
+
+
+def save_model(path: Path, centers: np.ndarray, medoids: np.ndarray, mode: str,
+               clustering: Optional[IncrementalClustering] = None) -> None:
+    """
+    Сохраняет обученную модель в .npz: centers — по ним назначаются метки
+    (центроиды KMeans или медоиды k-medoids), medoids — для отчёта.
+    С clustering сохраняются и точки кластеров с суммами расстояний —
+    чтобы APPEND_CSV добавлял пачки без пересчёта.
+    """
+    state = clustering.state() if clustering is not None else {}
+    tmp = path.with_name(path.name + ".tmp")
+    with tmp.open("wb") as f:
+        np.savez(f, centers=np.asarray(centers, dtype=float),
+                 medoids=np.asarray(medoids, dtype=float), mode=np.array(mode), **state)
+    os.replace(tmp, path)
+
+
+def load_model(path: Path) -> Tuple[np.ndarray, np.ndarray, str]:
+    if not path.exists():
+        raise FileNotFoundError(f"Модель не найдена: {path.resolve()}")
+    with np.load(path) as data:
+        return data["centers"], data["medoids"], str(data["mode"])
+
+
+def load_clustering(path: Path) -> Optional[IncrementalClustering]:
+    """Состояние IncrementalClustering из модели или None, если модель сохранена без него."""
+    with np.load(path) as data:
+        if "sums" not in data:
+            return None
+        return IncrementalClustering.from_state(data["centers"], data["points"], data["labels"], data["sums"])
+
+
+def append_csv(model_path: Path, csv_path: Path, input_csv: Path) -> Tuple[List[int], np.ndarray]:
+    """
+    Добавляет точки csv_path к сохранённой модели и возвращает (размеры кластеров, медоиды).
+    Центры не меняются: новая точка идёт в кластер ближайшего центра, суммы
+    расстояний пересчитываются только на пачку. Если в модели ещё нет точек
+    кластеров, они один раз строятся из input_csv (метки — по ближайшему центру).
+    Обновлённое состояние записывается обратно в model_path.
+    """
+    centers, _, mode = load_model(model_path)
+    clustering = load_clustering(model_path)
+    if clustering is None:
+        pts = np.asarray(load_points_csv(input_csv), dtype=float)
+        clustering = IncrementalClustering(pts, assign_points(pts, centers), centers)
+    for chunk in iter_points_csv(csv_path):
+        clustering.add(chunk)
+    medoids = clustering.medoids()
+    save_model(model_path, centers, medoids, mode, clustering)
+    return clustering.sizes(), medoids
+
+
+def print_medoids(sizes: List[int], medoids: np.ndarray) -> None:
+    results = [(cid + 1, size, float(m[0]), float(m[1])) for cid, (size, m) in enumerate(zip(sizes, medoids))]
     if SORT_OUTPUT_BY_MEDOID:
         results.sort(key=lambda t: (t[2], t[3]))
 
@@ -216,5 +997,90 @@ def main() -> None:
         print(f"{cid:>7} | {size:>5} | {x:>10.6f} | {y:>10.6f}")
 
 
+def assign_points(pts: np.ndarray, centers: np.ndarray) -> np.ndarray:
+    """Метки ближайшего центра; расстояния считаются блоками в пределах MEDOID_MEMORY_BYTES."""
+    return _nearest_two(pts, np.asarray(centers, dtype=float))[0]
+
+
+def assign_csv(model_path: Path, csv_path: Path, out_path: Path) -> np.ndarray:
+    """
+    Разметка новых точек сохранённой моделью без переобучения: CSV читается
+    блоками, метки (с 1, как в отчёте) пишутся в out_path строками x;y;cluster.
+    Возвращает число точек в каждом кластере.
+    """
+    centers, _, _ = load_model(model_path)
+    counts = np.zeros(centers.shape[0], dtype=np.int64)
+    with out_path.open("w", encoding="utf-8", newline="") as out:
+        out.write("x;y;cluster\n")
+        for chunk in iter_points_csv(csv_path):
+            labels = assign_points(chunk, centers)
+            counts += np.bincount(labels, minlength=centers.shape[0])
+            np.savetxt(out, np.column_stack([chunk, labels + 1]), fmt=["%.17g", "%.17g", "%d"], delimiter=";")
+    return counts
+
+
+def main() -> None:
+    if ASSIGN_CSV is not None:
+        out_path = ASSIGN_CSV.with_name(ASSIGN_CSV.stem + ".labels.csv")
+        counts = assign_csv(MODEL_PATH, ASSIGN_CSV, out_path)
+        print(f"Разметка по модели {MODEL_PATH}: {int(counts.sum())} точек -> {out_path}")
+        print("Формат: кластер | размер")
+        for cid, size in enumerate(counts, start=1):
+            print(f"{cid:>7} | {size:>5}")
+        return
+
+    if APPEND_CSV is not None:
+        sizes, medoids = append_csv(MODEL_PATH, APPEND_CSV, INPUT_CSV)
+        print(f"Пачка {APPEND_CSV} добавлена к модели {MODEL_PATH}")
+        print_medoids(sizes, medoids)
+        return
+
+    k = K
+    if MODE == "minibatch":
+        pts = open_points_mmap(INPUT_CSV)
+    elif MODE in ("kmeans", "kmedoids"):
+        pts = load_points_csv(INPUT_CSV)
+    else:
+        raise ValueError(f"Неизвестный MODE: {MODE!r}")
+
+    if K_SWEEP:
+        sweep_pts = pts
+        if MODE == "minibatch" and pts.shape[0] > CHUNK_ROWS:
+            # все точки в общую память не копируются: перебор K по случайной выборке
+            rng = np.random.default_rng(SEED)
+            sweep_pts = np.asarray(pts[np.sort(rng.choice(pts.shape[0], size=CHUNK_ROWS, replace=False))])
+            print(f"Перебор K по выборке из {CHUNK_ROWS} точек")
+        sweep = sweep_k(sweep_pts, list(K_SWEEP), SEED)
+        print("Перебор K. Формат: K | inertia | silhouette")
+        for kk, inertia, sil in sweep:
+            print(f"{kk:>3} | {inertia:>14.4f} | {sil:>8.4f}")
+        k = max(sweep, key=lambda t: t[2])[0]
+        print(f"Выбран K={k} (максимальный silhouette)\n")
+
+    medoids = None
+    if MODE == "kmedoids":
+        labels, medoids = fit_kmedoids(pts, k, SEED)
+        centers = medoids
+    elif MODE == "minibatch":
+        labels, centers = fit_minibatch(pts, k, SEED)
+        medoids = medoids_streamed(pts, labels, centers, SEED)
+    else:
+        kmeans = KMeans(n_clusters=k, n_init=N_INIT, random_state=SEED)
+        labels = kmeans.fit_predict(pts)
+        centers = kmeans.cluster_centers_
+
+    if RUN_BENCHMARK:
+        benchmark_clustering(pts, k, SEED)
+        benchmark_medoid()
+
+    if medoids is None:
+        medoids = np.array([medoid(pts[labels == cid]) for cid in range(k)])
+
+    if SAVE_MODEL:
+        save_model(MODEL_PATH, centers, medoids, MODE)
+
+    print_medoids([int(np.count_nonzero(labels == cid)) for cid in range(k)], medoids)
+
+
 if __name__ == "__main__":
     main()
@@ -33,70 +33,532 @@ Carlos Bienvenido Front Barrera Rowing Men's Coxed Eights
    8) Зимняя ОИ‑2006: сводная таблица (pivot) по числу медалей каждого достоинства на страну, без NaN (fill_value=0).
 
 Скрипт печатает ключевые результаты, строит гистограмму для п. 6 и выдаёт таблицы для п. 7–8.
+
+Режим сервера: `python lab4_2.py --serve [host:port | путь.sock]` держит данные,
+индекс и куб медалей в памяти и отвечает на вопросы (формат — как в QUESTIONS)
+по JSON, по одному запросу на строку:
+    {"questions": [{"name": "h", "where": {"Year": 2000}, "agg": ["Height", "mean"]}]}
+Ответ: {"ok": true, "answers": {"h": ...}}; таблицы — в виде to_json(orient="split").
 """
 
+import asyncio
+import json
+import os
+import socket
+import stat
+import sys
+import warnings
+
+import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
 
 
-df = pd.read_csv("athlete_events.csv")
-
-# 2) Полнота/пропуски
-print("=== Количество непустых значений по столбцам ===")
-print(df.count())
-print("\n=== Число пропусков по столбцам ===")
-print(df.isna().sum())
-
-# 3) describe по Age/Height/Weight
-print("\n=== describe(Age, Height, Weight) ===")
-print(df[["Age", "Height", "Weight"]].describe())
-
-# 4.1) Самый юный участник в 1992
-y1992 = df[df["Year"] == 1992]
-min_age = int(y1992["Age"].min())
-print(f"\nСамый юный участник в 1992: {min_age} лет")
-print(y1992[y1992["Age"] == min_age][["Name", "Event"]].drop_duplicates())
-
-# 4.2) Все виды спорта
-sports = sorted(df["Sport"].dropna().unique().tolist())
-print(f"\nВсего уникальных видов спорта: {len(sports)}")
-print("Первые 15:", sports[:15])
-
-# 4.3) Средний рост теннисисток 2000 г.
-mask = (df["Year"] == 2000) & (df["Sex"] == "F") & (df["Sport"] == "Tennis")
-print("\nСредний рост теннисисток (2000):", float(df.loc[mask, "Height"].mean()))
-
-# 4.4) Золото Китая в настольном теннисе, 2008
-mask_tt = (df["Year"] == 2008) & (df["Sport"] == "Table Tennis") & (df["Medal"] == "Gold") & (df["NOC"] == "CHN")
-print("\nЗолотых медалей Китая (настольный теннис, 2008):", int(mask_tt.sum()))
-
-# 4.5) Изменение количества видов спорта 1988 vs 2004 (Summer)
-s88 = df[(df["Season"] == "Summer") & (df["Year"] == 1988)]["Sport"].nunique()
-s04 = df[(df["Season"] == "Summer") & (df["Year"] == 2004)]["Sport"].nunique()
-print(f"\nЛетние ОИ: 1988 — {s88}, 2004 — {s04}. Изменение: {s04 - s88:+d}")
-
-# 4.6) Гистограмма возраста мужчин-керлингистов (2014)
-mask_curl_2014_m = (df["Year"] == 2014) & (df["Sport"] == "Curling") & (df["Sex"] == "M")
-ages = df.loc[mask_curl_2014_m, "Age"].dropna()
-plt.figure()
-plt.hist(ages)
-plt.xlabel("Возраст (годы)")
-plt.ylabel("Частота")
-plt.title("Распределение возраста мужчин-керлингистов (ОИ 2014)")
-plt.show()
-
-# 4.7) Зимняя 2006: по странам — число медалей и средний возраст (только с ≥1 медалью)
-w06 = df[(df["Season"] == "Winter") & (df["Year"] == 2006)]
-w06_med = w06.dropna(subset=["Medal"])
-grouped = (
-    w06_med.groupby("NOC")
-    .agg(medals=("Medal", "count"), avg_age=("Age", "mean"))
-    .sort_values("medals", ascending=False)
-)
-print("\n=== Зимняя 2006: медали и средний возраст по странам (только с ≥1 медалью) ===")
-print(grouped)
-
-# 4.8) Зимняя 2006: pivot по медалям (без NaN)
-pivot = w06_med.pivot_table(index="NOC", columns="Medal", values="ID", aggfunc="count", fill_value=0).reset_index()
-print("\n=== Зимняя 2006: сводная таблица медалей (pivot) ===")
-print(pivot)
+CSV_PATH = "athlete_events.csv"
+CACHE_DIR = CSV_PATH + ".cache"   # колоночный кэш; пересобирается при изменении размера/mtime CSV
+CUBE_DIR = CSV_PATH + ".medal_cube"
+SERVE_ADDRESS = "127.0.0.1:8765"   # "host:port" или путь к Unix-сокету
+
+
+def _source_key(path):
+    st = os.stat(path)
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+
+def _smallest_int(lo, hi):
+    for dtype in (np.int8, np.int16, np.int32, np.int64):
+        info = np.iinfo(dtype)
+        if info.min <= lo and hi <= info.max:
+            return dtype
+    return np.int64
+
+
+def _encode_column(s):
+    """
+    Столбец -> (описание, массивы для диска).
+    Строки — словарь (категории) + целые коды минимальной ширины.
+    Целые без пропусков остаются целыми и в памяти (Year, ID).
+    Дробные с NaN хранятся компактно (целые с маркером пропуска или
+    float32, если это без потерь), а при загрузке снова становятся float64 —
+    так describe/mean дают ровно те же числа, что и при чтении CSV.
+    """
+    if not pd.api.types.is_numeric_dtype(s.dtype):
+        cat = pd.Categorical(s)
+        codes = cat.codes.astype(_smallest_int(-1, len(cat.categories)))
+        return {"kind": "category"}, {"codes": codes, "cats": np.asarray(cat.categories, dtype=str)}
+
+    if pd.api.types.is_integer_dtype(s.dtype):
+        dtype = _smallest_int(int(s.min()), int(s.max())) if len(s) else np.int64
+        return {"kind": "int"}, {"values": s.to_numpy(dtype=dtype)}
+
+    values = s.to_numpy(dtype=float)
+    isna = np.isnan(values)
+    valid = values[~isna]
+    if valid.size and np.all(valid == np.round(valid)):
+        lo, hi = int(valid.min()), int(valid.max())
+        dtype = _smallest_int(lo, hi + 1)
+        sentinel = hi + 1
+        packed = np.where(isna, sentinel, values).astype(dtype)
+        return {"kind": "float_as_int", "na": sentinel}, {"values": packed}
+    if np.array_equal(valid.astype(np.float32).astype(float), valid):
+        return {"kind": "float"}, {"values": values.astype(np.float32)}
+    return {"kind": "float"}, {"values": values}
+
+
+def _decode_column(meta, arrays):
+    kind = meta["kind"]
+    if kind == "category":
+        return pd.Categorical.from_codes(arrays["codes"], categories=arrays["cats"])
+    if kind == "int":
+        return arrays["values"]
+    values = arrays["values"].astype(float)
+    if kind == "float_as_int":
+        values[arrays["values"] == meta["na"]] = np.nan
+    return values
+
+
+def _read_columns(cache_dir, key):
+    """Фрейм из колоночного кэша или None, если кэша нет или он от другой версии CSV."""
+    try:
+        with open(os.path.join(cache_dir, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if meta.get("source") != key:
+        return None
+    data = {}
+    for i, col in enumerate(meta["columns"]):
+        arrays = {name: np.load(os.path.join(cache_dir, f"{i}.{name}.npy")) for name in col["arrays"]}
+        data[col["name"]] = _decode_column(col, arrays)
+    return pd.DataFrame(data)
+
+
+def _write_columns(df, cache_dir, key):
+    os.makedirs(cache_dir, exist_ok=True)
+    columns = []
+    for i, name in enumerate(df.columns):
+        col, arrays = _encode_column(df[name])
+        for arr_name, arr in arrays.items():
+            np.save(os.path.join(cache_dir, f"{i}.{arr_name}.npy"), arr)
+        columns.append({"name": name, "arrays": list(arrays), **col})
+    with open(os.path.join(cache_dir, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump({"source": key, "columns": columns}, f, ensure_ascii=False)
+
+
+def _cached_frame(df, cache_dir, key):
+    """
+    Записывает df в колоночный кэш и читает его обратно. Если записать
+    нельзя (каталог только для чтения и т.п.), те же столбцы кодируются в
+    памяти — фрейм получается тем же, просто без кэша на диске.
+    """
+    try:
+        _write_columns(df, cache_dir, key)
+    except OSError as e:
+        warnings.warn(f"Кэш {cache_dir} не записан ({e}); работаем без него.")
+        return pd.DataFrame({name: _decode_column(*_encode_column(df[name])) for name in df.columns})
+    return _read_columns(cache_dir, key)
+
+
+def load_athletes(path=CSV_PATH, cache_dir=CACHE_DIR):
+    """
+    athlete_events.csv через колоночный кэш (по файлу .npy на массив).
+    Кэш используется, пока размер и mtime CSV не изменились; иначе CSV
+    читается заново и кэш перезаписывается.
+    """
+    key = _source_key(path)
+    df = _read_columns(cache_dir, key)
+    if df is None:
+        df = _cached_frame(pd.read_csv(path), cache_dir, key)
+    return df
+
+
+def build_medal_cube(df):
+    """
+    Куб медалей за один проход: для каждой (NOC, Games, Medal, Sport) —
+    число медалей, сумма и количество известных возрастов.
+    """
+    medals = df.dropna(subset=["Medal"])
+    return (
+        medals.groupby(["NOC", "Games", "Medal", "Sport"], observed=True)
+        .agg(medals=("Medal", "size"), age_sum=("Age", "sum"), age_count=("Age", "count"))
+        .reset_index()
+    )
+
+
+def load_medal_cube(df, path=CSV_PATH, cache_dir=CUBE_DIR):
+    """Куб медалей с диска; строится заново, если изменился исходный CSV."""
+    key = _source_key(path)
+    cube = _read_columns(cache_dir, key)
+    if cube is None:
+        cube = _cached_frame(build_medal_cube(df), cache_dir, key)
+    return cube
+
+
+def cube_medal_table(cube, games):
+    """Медали и средний возраст по странам на одних Играх — срез куба (как groupby("NOC") по строкам с медалями)."""
+    part = cube[cube["Games"] == games]
+    totals = part.groupby("NOC", observed=True)[["medals", "age_sum", "age_count"]].sum()
+    # int64, как у count(): иначе сортировка с равными значениями может дать другой порядок
+    table = pd.DataFrame({"medals": totals["medals"].astype(np.int64),
+                          "avg_age": totals["age_sum"] / totals["age_count"]})
+    return table.sort_values("medals", ascending=False)
+
+
+def cube_medal_pivot(cube, games):
+    """Число медалей каждого достоинства по странам на одних Играх — срез куба."""
+    part = cube[cube["Games"] == games]
+    pivot = part.pivot_table(index="NOC", columns="Medal", values="medals", aggfunc="sum", fill_value=0,
+                             observed=True)
+    return pivot.astype(np.int64).reset_index()
+
+
+CUBE_VIEWS = {"medal_table": cube_medal_table, "medal_pivot": cube_medal_pivot}
+
+
+def build_partition_index(df):
+    """
+    Индекс разделов: ключ -> позиции строк (по возрастанию).
+    "games" — (Season, Year), "year" — Year (обе ОИ года), "sport" — Sport.
+    """
+    games = df.groupby(["Season", "Year"], sort=False, observed=True).indices
+    by_year = {}
+    for (_, year), pos in games.items():
+        by_year.setdefault(year, []).append(pos)
+    year = {y: np.sort(np.concatenate(parts)) for y, parts in by_year.items()}
+    sport = df.groupby("Sport", sort=False, observed=True).indices
+    return {"games": games, "year": year, "sport": sport}
+
+
+def _positions(index, conds):
+    """Позиции строк самого узкого раздела индекса, подходящего к условиям (None — подходящего нет)."""
+    empty = np.empty(0, dtype=np.intp)
+    parts = []
+    if "Season" in conds and "Year" in conds:
+        parts.append(index["games"].get((conds["Season"], conds["Year"]), empty))
+    if "Year" in conds:
+        parts.append(index["year"].get(conds["Year"], empty))
+    if "Sport" in conds:
+        parts.append(index["sport"].get(conds["Sport"], empty))
+    return min(parts, key=len) if parts else None
+
+
+def query(df, index, **conds):
+    """
+    Строки, где каждый столбец равен заданному значению — то же, что
+    df[(df[col1] == v1) & (df[col2] == v2) ...], но маска строится только
+    по самому узкому подходящему разделу индекса, а не по всем строкам.
+    """
+    pos = _positions(index, conds)
+    sub = df.iloc[pos] if pos is not None else df
+    mask = np.ones(len(sub), dtype=bool)
+    for col, value in conds.items():
+        mask &= (sub[col] == value).to_numpy()
+    return sub[mask]
+
+
+# Агрегаты, которые groupby считает точно так же, как по отдельному срезу
+# (mean/sum/std в groupby суммируют в другом порядке — их не объединяем)
+GROUPABLE_AGGS = {"min", "max", "count", "size", "nunique"}
+
+
+def _filter_key(q):
+    return tuple(sorted(q.get("where", {}).items())), q.get("notna")
+
+
+def _subset(df, index, key):
+    where, notna = key
+    sub = query(df, index, **dict(where)) if where else df
+    return sub.dropna(subset=[notna]) if notna else sub
+
+
+def _scalar(s, func):
+    if func == "unique":
+        return sorted(s.dropna().unique().tolist())
+    return s.agg(func)
+
+
+def evaluate(df, index, questions, cube=None):
+    """
+    Отвечает на пакет именованных вопросов и возвращает {имя: ответ}.
+
+    Вопрос — словарь: "where" (равенства столбцов), "notna" (столбец без
+    пропусков) и одно из:
+      "agg": (столбец, функция)        — скаляр ("min", "mean", "nunique", "unique", ...);
+      "rows": [столбцы]                — строки; "at_min": столбец — только с его минимумом,
+                                         "distinct" — без дубликатов, "dropna" — без пропусков;
+      "describe": [столбцы];
+      "groupby": столбец, "named": {имя: (столбец, функция)}, "sort": (имя, по возрастанию);
+      "pivot": {"index", "columns", "values", "aggfunc"};
+      "cube": имя из CUBE_VIEWS, "games": Игры — готовый срез куба медалей (нужен cube).
+
+    План: вопросы с одинаковым фильтром разделяют один срез (через индекс)
+    и кэш агрегатов; фильтры, отличающиеся только значениями тех же столбцов
+    и содержащие лишь агрегаты из GROUPABLE_AGGS, считаются одним groupby
+    по объединению их разделов (один срез, одна маска, один groupby).
+    """
+    groups = {}
+    for q in questions:
+        groups.setdefault(_filter_key(q), []).append(q)
+
+    answers = {}
+
+    siblings = {}
+    for key, qs in groups.items():
+        where, notna = key
+        if where and all("agg" in q and q["agg"][1] in GROUPABLE_AGGS for q in qs):
+            siblings.setdefault((tuple(c for c, _ in where), notna), []).append(key)
+    for (cols, notna), keys in siblings.items():
+        if len(keys) < 2:
+            continue
+        parts = [_positions(index, dict(key[0])) for key in keys]
+        if any(p is None for p in parts):
+            union = df
+        else:
+            # разделы разных фильтров могут пересекаться (год и вид спорта) — повторы убираем
+            pos = np.sort(np.concatenate(parts))
+            union = df.iloc[pos[np.r_[True, pos[1:] != pos[:-1]]]]
+        # одна маска по общему срезу: строка подходит хотя бы одному из фильтров
+        mask = np.zeros(len(union), dtype=bool)
+        for key in keys:
+            match = np.ones(len(union), dtype=bool)
+            for col, value in key[0]:
+                match &= (union[col] == value).to_numpy()
+            mask |= match
+        union = union[mask]
+        if notna:
+            union = union.dropna(subset=[notna])
+        spec = {}
+        for key in keys:
+            for q in groups[key]:
+                spec.setdefault(q["agg"][0], set()).add(q["agg"][1])
+        table = union.groupby(list(cols), observed=True).agg({c: sorted(f) for c, f in spec.items()})
+        for key in keys:
+            values = tuple(v for _, v in key[0])
+            row = values if len(values) > 1 else values[0]
+            for q in groups.pop(key):
+                col, func = q["agg"]
+                if row in table.index:
+                    answers[q["name"]] = table.loc[row, (col, func)]
+                else:
+                    answers[q["name"]] = _scalar(df[col].iloc[:0], func)
+
+    for key, qs in groups.items():
+        sub = _subset(df, index, key)
+        memo = {}
+
+        def agg(col, func):
+            if (col, func) not in memo:
+                memo[(col, func)] = _scalar(sub[col], func)
+            return memo[(col, func)]
+
+        for q in qs:
+            if "agg" in q:
+                answer = agg(*q["agg"])
+            elif "rows" in q:
+                rows = sub
+                if "at_min" in q:
+                    rows = rows[rows[q["at_min"]] == agg(q["at_min"], "min")]
+                answer = rows[q["rows"]]
+                if q.get("distinct"):
+                    answer = answer.drop_duplicates()
+                if q.get("dropna"):
+                    answer = answer.dropna()
+            elif "describe" in q:
+                answer = sub[q["describe"]].describe()
+            elif "groupby" in q:
+                answer = sub.groupby(q["groupby"], observed=True).agg(**q["named"])
+                if "sort" in q:
+                    answer = answer.sort_values(q["sort"][0], ascending=q["sort"][1])
+            elif "pivot" in q:
+                answer = sub.pivot_table(**q["pivot"], fill_value=0, observed=True).reset_index()
+            elif "cube" in q:
+                answer = CUBE_VIEWS[q["cube"]](cube, q["games"])
+            else:
+                raise ValueError(f"Неизвестный тип вопроса: {q['name']}")
+            answers[q["name"]] = answer
+
+    return answers
+
+
+QUESTIONS = [
+    {"name": "describe", "describe": ["Age", "Height", "Weight"]},
+    {"name": "min_age_1992", "where": {"Year": 1992}, "agg": ("Age", "min")},
+    {"name": "youngest_1992", "where": {"Year": 1992}, "rows": ["Name", "Event"], "at_min": "Age", "distinct": True},
+    {"name": "sports", "agg": ("Sport", "unique")},
+    {"name": "tennis_f_height_2000", "where": {"Year": 2000, "Sex": "F", "Sport": "Tennis"}, "agg": ("Height", "mean")},
+    {"name": "chn_tt_gold_2008", "where": {"Year": 2008, "Sport": "Table Tennis", "Medal": "Gold", "NOC": "CHN"},
+     "agg": ("ID", "size")},
+    {"name": "sports_1988", "where": {"Season": "Summer", "Year": 1988}, "agg": ("Sport", "nunique")},
+    {"name": "sports_2004", "where": {"Season": "Summer", "Year": 2004}, "agg": ("Sport", "nunique")},
+    {"name": "curling_m_ages_2014", "where": {"Year": 2014, "Sport": "Curling", "Sex": "M"}, "rows": ["Age"],
+     "dropna": True},
+    {"name": "medals_w2006", "cube": "medal_table", "games": "2006 Winter"},
+    {"name": "pivot_w2006", "cube": "medal_pivot", "games": "2006 Winter"},
+]
+
+
+def _question_from_json(q):
+    """JSON не различает списки и кортежи — возвращаем кортежи там, где их ждёт evaluate."""
+    q = dict(q)
+    for field in ("agg", "sort"):
+        if field in q:
+            q[field] = tuple(q[field])
+    if "named" in q:
+        q["named"] = {name: tuple(spec) for name, spec in q["named"].items()}
+    return q
+
+
+def _answer_to_json(answer):
+    if isinstance(answer, (pd.DataFrame, pd.Series)):
+        return json.loads(answer.to_json(orient="split", force_ascii=False))
+    if isinstance(answer, np.generic):
+        answer = answer.item()
+    if isinstance(answer, float) and np.isnan(answer):
+        return None
+    return answer
+
+
+def _parse_address(address):
+    if "/" in address or address.endswith(".sock"):
+        return None, address
+    host, _, port = address.rpartition(":")
+    return (host or "127.0.0.1", int(port)), None
+
+
+def load_all(path=CSV_PATH):
+    """Данные, индекс разделов и куб медалей — всё, что нужно evaluate."""
+    df = load_athletes(path)
+    return {"key": _source_key(path), "df": df, "index": build_partition_index(df), "cube": load_medal_cube(df, path)}
+
+
+async def serve(address=SERVE_ADDRESS, path=CSV_PATH):
+    """
+    Локальный сервер вопросов. Данные загружаются один раз; если CSV изменился
+    (размер/mtime), они перечитываются перед следующим запросом. Каждый запрос
+    считается в пуле потоков, так что медленный вопрос не блокирует остальные
+    соединения.
+    """
+    loop = asyncio.get_running_loop()
+    state = await loop.run_in_executor(None, load_all, path)
+    reload_lock = asyncio.Lock()
+
+    async def current():
+        nonlocal state
+        async with reload_lock:
+            if _source_key(path) != state["key"]:
+                state = await loop.run_in_executor(None, load_all, path)
+        return state
+
+    def answer(request, data):
+        questions = [_question_from_json(q) for q in request["questions"]]
+        answers = evaluate(data["df"], data["index"], questions, data["cube"])
+        return {"ok": True, "answers": {name: _answer_to_json(a) for name, a in answers.items()}}
+
+    async def handle(reader, writer):
+        try:
+            while line := await reader.readline():
+                try:
+                    data = await current()
+                    response = await loop.run_in_executor(None, answer, json.loads(line), data)
+                except Exception as e:
+                    response = {"ok": False, "error": f"{type(e).__name__}: {e}"}
+                writer.write(json.dumps(response, ensure_ascii=False).encode("utf-8") + b"\n")
+                await writer.drain()
+        finally:
+            writer.close()
+
+    tcp, unix_path = _parse_address(address)
+    if unix_path:
+        if os.path.lexists(unix_path):
+            # удаляем только оставшийся от прошлого запуска сокет, не чужой файл
+            if not stat.S_ISSOCK(os.lstat(unix_path).st_mode):
+                raise FileExistsError(f"{unix_path} существует и не является сокетом")
+            os.unlink(unix_path)
+        server = await asyncio.start_unix_server(handle, path=unix_path, limit=2**24)
+    else:
+        server = await asyncio.start_server(handle, *tcp, limit=2**24)
+    print(f"Сервер вопросов слушает {address} (строк: {len(state['df'])})", flush=True)
+    async with server:
+        await server.serve_forever()
+
+
+def ask(questions, address=SERVE_ADDRESS):
+    """Клиент: отправляет пакет вопросов запущенному серверу и возвращает словарь ответов."""
+    tcp, unix_path = _parse_address(address)
+    if unix_path:
+        conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        conn.connect(unix_path)
+    else:
+        conn = socket.create_connection(tcp)
+    with conn, conn.makefile("rwb") as f:
+        f.write(json.dumps({"questions": questions}, ensure_ascii=False).encode("utf-8") + b"\n")
+        f.flush()
+        response = json.loads(f.readline())
+    if not response["ok"]:
+        raise RuntimeError(response["error"])
+    return response["answers"]
+
+
+def report(df, index, cube):
+    # 2) Полнота/пропуски
+    print("=== Количество непустых значений по столбцам ===")
+    print(df.count())
+    print("\n=== Число пропусков по столбцам ===")
+    print(df.isna().sum())
+
+    answers = evaluate(df, index, QUESTIONS, cube)
+
+    # 3) describe по Age/Height/Weight
+    print("\n=== describe(Age, Height, Weight) ===")
+    print(answers["describe"])
+
+    # 4.1) Самый юный участник в 1992
+    min_age = int(answers["min_age_1992"])
+    print(f"\nСамый юный участник в 1992: {min_age} лет")
+    print(answers["youngest_1992"])
+
+    # 4.2) Все виды спорта
+    sports = answers["sports"]
+    print(f"\nВсего уникальных видов спорта: {len(sports)}")
+    print("Первые 15:", sports[:15])
+
+    # 4.3) Средний рост теннисисток 2000 г.
+    print("\nСредний рост теннисисток (2000):", float(answers["tennis_f_height_2000"]))
+
+    # 4.4) Золото Китая в настольном теннисе, 2008
+    print("\nЗолотых медалей Китая (настольный теннис, 2008):", int(answers["chn_tt_gold_2008"]))
+
+    # 4.5) Изменение количества видов спорта 1988 vs 2004 (Summer)
+    s88 = int(answers["sports_1988"])
+    s04 = int(answers["sports_2004"])
+    print(f"\nЛетние ОИ: 1988 — {s88}, 2004 — {s04}. Изменение: {s04 - s88:+d}")
+
+    # 4.6) Гистограмма возраста мужчин-керлингистов (2014)
+    ages = answers["curling_m_ages_2014"]["Age"]
+    plt.figure()
+    plt.hist(ages)
+    plt.xlabel("Возраст (годы)")
+    plt.ylabel("Частота")
+    plt.title("Распределение возраста мужчин-керлингистов (ОИ 2014)")
+    plt.show()
+
+    # 4.7) Зимняя 2006: по странам — число медалей и средний возраст (только с ≥1 медалью)
+    print("\n=== Зимняя 2006: медали и средний возраст по странам (только с ≥1 медалью) ===")
+    print(answers["medals_w2006"])
+
+    # 4.8) Зимняя 2006: pivot по медалям (без NaN)
+    print("\n=== Зимняя 2006: сводная таблица медалей (pivot) ===")
+    print(answers["pivot_w2006"])
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv and argv[0] == "--serve":
+        asyncio.run(serve(*argv[1:2]))
+        return
+    df = load_athletes()
+    report(df, build_partition_index(df), load_medal_cube(df))
+
+
+if __name__ == "__main__":
+    main()
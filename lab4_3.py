@@ -48,12 +48,38 @@ Yes                   186   137    0.424149
    Ошибка I рода (ложноположительные): 0.107
    Ошибка II рода (ложноотрицательные): 0.470
 
+9) Поиск правил: пороги по каждому числовому столбцу (≥/≤) в сочетании (OR) с флагами
+   (International plan); печатается Парето-фронт по ошибкам I и II рода
+   и правила фронта, которые не хуже правила из п. 8 по обеим ошибкам.
+
 Все таблицы и топ‑10 по длительности звонков печатаются при запуске.
+Для больших выгрузок: CHUNK_BYTES — потоковый режим (куски файла считаются
+независимо, при CHUNK_WORKERS > 1 — в пуле процессов, частичные агрегаты
+складываются); п. 1–8 совпадают с расчётом в памяти, п. 9 в нём не выполняется.
+Квантили describe() в потоковом режиме точные: по частотам значений, пока
+столбец квантован (минуты с шагом 0.1, счётчики), иначе — дополнительными
+проходами по файлу; память не растёт с числом различных значений.
 """
 
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from functools import reduce
+from heapq import heappush, heapreplace
+from itertools import combinations
+
+import numpy as np
 import pandas as pd
 
 
+CSV_PATH = "telecom_churn.csv"
+CHUNK_BYTES = None   # None — файл целиком в память; число — потоковый режим кусками такого размера
+CHUNK_WORKERS = 1    # > 1 — куски потокового режима считаются в пуле процессов
+VALUE_COUNTS_MAX = 100_000   # потоковый режим: частоты столбца хранятся, пока различных значений не больше
+TOP_K = 10
+TOP_BY = None        # "State" / "Area code" — дополнительно топ по средней длительности звонка в каждой группе
+
 use_cols = [
     "State", "Area code", "International plan", "Number vmail messages",
     "Total day minutes", "Total day calls",
@@ -61,56 +87,571 @@ use_cols = [
     "Total night minutes", "Total night calls",
     "Customer service calls", "Churn"
 ]
-df = pd.read_csv("telecom_churn.csv", usecols=use_cols)
-
-print("=== Пропуски по столбцам ===")
-print(df.isna().sum())
-
-print("\n=== Описательная статистика (числовые) ===")
-print(df.describe())
-
-print("\n=== value_counts по Churn ===")
-counts = df["Churn"].value_counts(dropna=False)
-print(counts)
-print("\nПроценты (%):")
-print((counts / len(df) * 100).round(2))
-
-total_minutes = df["Total day minutes"] + df["Total eve minutes"] + df["Total night minutes"]
-total_calls = df["Total day calls"] + df["Total eve calls"] + df["Total night calls"]
-df["Avg call duration"] = (total_minutes / total_calls.replace({0: pd.NA})).astype(float)
-
-print("\n=== Топ-10 по средней длительности звонка ===")
-print(df.sort_values("Avg call duration", ascending=False).head(10))
-
-print("\n=== Средняя длительность звонка по группам Churn ===")
-print(df.groupby("Churn")["Avg call duration"].mean())
-
-print("\n=== Среднее число звонков в поддержку по группам Churn ===")
-print(df.groupby("Churn")["Customer service calls"].mean())
-
-ct_calls = pd.crosstab(df["Customer service calls"], df["Churn"])
-ct_calls["churn_rate"] = ct_calls.get(True, 0) / ct_calls.sum(axis=1)
-print("\n=== Crosstab: Customer service calls × Churn ===")
-print(ct_calls)
-
-ct_plan = pd.crosstab(df["International plan"], df["Churn"])
-ct_plan["churn_rate"] = ct_plan.get(True, 0) / ct_plan.sum(axis=1)
-print("\n=== Crosstab: International plan × Churn ===")
-print(ct_plan)
-
-pred = (df["Customer service calls"] >= 4) | (df["International plan"].str.lower().eq("yes"))
-df["Predicted churn"] = pred
-
-y_true = df["Churn"].astype(bool)
-y_pred = df["Predicted churn"].astype(bool)
-fp = int(((y_pred == True) & (y_true == False)).sum())
-fn = int(((y_pred == False) & (y_true == True)).sum())
-tn = int(((y_pred == False) & (y_true == False)).sum())
-tp = int(((y_pred == True) & (y_true == True)).sum())
-fp_rate = fp / (fp + tn) if (fp + tn) > 0 else float("nan")
-fn_rate = fn / (fn + tp) if (fn + tp) > 0 else float("nan")
-
-print("\n=== Оценка ошибок правила (Predicted churn) ===")
-print(f"FP={fp}, FN={fn}, TN={tn}, TP={tp}")
-print(f"Ошибка I рода (ложноположительные): {fp_rate:.3f}")
-print(f"Ошибка II рода (ложноотрицательные): {fn_rate:.3f}")
+
+
+def confusion(y_true, y_pred):
+    """(TN, FP, FN, TP) за один проход: bincount по коду 2*y_true + y_pred."""
+    codes = 2 * np.asarray(y_true, dtype=np.int64) + np.asarray(y_pred, dtype=np.int64)
+    tn, fp, fn, tp = np.bincount(codes, minlength=4)
+    return int(tn), int(fp), int(fn), int(tp)
+
+
+def _flag_columns(df, target):
+    """Столбцы-флаги: ровно два значения, одно из которых 'yes' (без учёта регистра)."""
+    flags = {}
+    for col in df.columns:
+        if col == target or pd.api.types.is_numeric_dtype(df[col].dtype):
+            continue
+        values = df[col].dropna().unique()
+        yes = [v for v in values if str(v).lower() == "yes"]
+        if len(values) == 2 and yes:
+            flags[col] = yes[0]
+    return flags
+
+
+def search_rules(df, target="Churn", columns=None, flags=None, max_flags=2, pareto=True):
+    """
+    Перебор правил вида (столбец >= t | столбец <= t) OR флаг1 OR флаг2 ...
+    для всех порогов t из значений каждого числового столбца и всех наборов
+    флагов (до max_flags штук), включая правила только из флагов.
+
+    Для каждого столбца значения сортируются один раз (np.unique); при
+    фиксированном наборе флагов строки, не покрытые флагами, раскладываются
+    через bincount по кодам значений, и накопленные суммы дают FP/TP сразу
+    для всех порогов. Возвращает таблицу правил с FP/FN/TN/TP и долями
+    ошибок I и II рода; при pareto=True — только Парето-фронт по этим
+    двум долям (по возрастанию доли ошибок I рода).
+    """
+    y = df[target].astype(bool).to_numpy()
+    n_pos = int(y.sum())
+    n_neg = len(y) - n_pos
+    if columns is None:
+        columns = [c for c in df.columns
+                   if c != target and pd.api.types.is_numeric_dtype(df[c].dtype) and not pd.api.types.is_bool_dtype(df[c].dtype)]
+    if flags is None:
+        flags = _flag_columns(df, target)
+    flag_masks = {col: (df[col] == value).to_numpy() for col, value in flags.items()}
+    subsets = [s for k in range(min(max_flags, len(flags)) + 1) for s in combinations(flags, k)]
+
+    parts = []
+
+    def add(rules, fp, tp):
+        fp = np.asarray(fp, dtype=np.int64)
+        tp = np.asarray(tp, dtype=np.int64)
+        part = pd.DataFrame(rules)
+        part["FP"], part["TP"] = fp, tp
+        parts.append(part)
+
+    covers = {}
+    for subset in subsets:
+        covered = np.zeros(len(y), dtype=bool)
+        for col in subset:
+            covered |= flag_masks[col]
+        covers[subset] = covered
+        add({"column": [None], "op": [None], "threshold": [np.nan], "flags": [subset]},
+            [int((covered & ~y).sum())], [int((covered & y).sum())])
+
+    for col in columns:
+        values = df[col].to_numpy(dtype=float)
+        known = ~np.isnan(values)
+        uniq, codes = np.unique(values[known], return_inverse=True)
+        y_known = y[known]
+        for subset, covered in covers.items():
+            fp_flags = int((covered & ~y).sum())
+            tp_flags = int((covered & y).sum())
+            free = ~covered[known]
+            pos = np.bincount(codes[free], weights=y_known[free], minlength=len(uniq)).astype(np.int64)
+            neg = np.bincount(codes[free], minlength=len(uniq)) - pos
+            # ">= uniq[j]": сумма по кодам j..end; "<= uniq[j]": по кодам 0..j
+            for op, pos_cum, neg_cum in ((">=", np.cumsum(pos[::-1])[::-1], np.cumsum(neg[::-1])[::-1]),
+                                         ("<=", np.cumsum(pos), np.cumsum(neg))):
+                add({"column": col, "op": op, "threshold": uniq, "flags": [subset] * len(uniq)},
+                    fp_flags + neg_cum, tp_flags + pos_cum)
+
+    rules = pd.concat(parts, ignore_index=True)
+    rules["FN"] = n_pos - rules["TP"]
+    rules["TN"] = n_neg - rules["FP"]
+    rules["fp_rate"] = rules["FP"] / n_neg if n_neg else np.nan
+    rules["fn_rate"] = rules["FN"] / n_pos if n_pos else np.nan
+    rules = rules[["column", "op", "threshold", "flags", "FP", "FN", "TN", "TP", "fp_rate", "fn_rate"]]
+    if pareto:
+        rules = pareto_front(rules)
+    rules.insert(0, "rule", [_rule_text(c, o, t, f, flags) for c, o, t, f in
+                             zip(rules["column"], rules["op"], rules["threshold"], rules["flags"])])
+    return rules
+
+
+def _rule_text(column, op, threshold, subset, flags):
+    # repr — кратчайшая запись, которая читается обратно ровно в проверенный порог
+    parts = [f"{column} {op} {float(threshold)!r}"] if column is not None else []
+    parts += [f"{col} == {flags[col]!r}" for col in subset]
+    return " OR ".join(parts) if parts else "никого (всегда False)"
+
+
+def pareto_front(rules):
+    """Правила, которые не хуже любых других сразу по обеим долям ошибок (без дубликатов по точке)."""
+    ordered = rules.sort_values(["fp_rate", "fn_rate"], kind="stable")
+    fn = ordered["fn_rate"].to_numpy()
+    best_before = np.minimum.accumulate(np.concatenate(([np.inf], fn[:-1])))
+    return ordered[fn < best_before].reset_index(drop=True)
+
+
+def add_avg_duration(df):
+    total_minutes = df["Total day minutes"] + df["Total eve minutes"] + df["Total night minutes"]
+    total_calls = df["Total day calls"] + df["Total eve calls"] + df["Total night calls"]
+    df["Avg call duration"] = (total_minutes / total_calls.replace({0: pd.NA})).astype(float)
+    return df
+
+
+def predict(df):
+    """Правило из п. 8: Customer service calls ≥ 4 OR International plan == 'Yes'."""
+    return (df["Customer service calls"] >= 4) | (df["International plan"].str.lower().eq("yes"))
+
+
+def top_k_rows(chunks, column, k, by=None):
+    """
+    Первые k строк по убыванию column — то же, что
+    df.sort_values(column, ascending=False, kind="stable").head(k): при равных
+    значениях раньше идёт меньший индекс, NaN — в конце. При by — в каждой
+    группе отдельно, группы по возрастанию ключа.
+
+    chunks — фреймы по порядку строк (индекс — номер строки). На группу
+    хранится min-куча из k лучших (значение, -индекс): строка, не лучшая
+    вершины заполненной кучи, отсекается векторно, остальные сначала
+    сужаются до k лучших на группу внутри куска. Память O(k) на группу.
+    """
+    heaps, nans = {}, {}
+    columns = dtypes = None
+    for chunk in chunks:
+        if columns is None:
+            columns, dtypes = chunk.columns, chunk.dtypes
+        values = chunk[column].to_numpy(dtype=float)
+        keys = chunk[by] if by else pd.Series(0, index=chunk.index)
+        is_nan = np.isnan(values)
+
+        # порог: минимум заполненной кучи группы; для NaN — заполнен ли их список
+        bound = keys.map({g: h[0][0] for g, h in heaps.items() if len(h) == k}).to_numpy(dtype=float)
+        nan_full = keys.map({g: len(r) == k for g, r in nans.items()}).fillna(False).to_numpy(dtype=bool)
+        cand = np.where(is_nan, ~nan_full, np.isnan(bound) | (values > bound))
+        if not by:
+            # одна группа: ниже k-го по величине значения куска ничто не попадёт в топ (O(n), без сортировки)
+            finite = values[cand & ~is_nan]
+            if len(finite) > k:
+                cand &= is_nan | (values >= np.partition(finite, -k)[-k])
+
+        idx = np.flatnonzero(cand)
+        codes = pd.factorize(keys.to_numpy()[idx])[0]
+        order = np.lexsort((idx, -np.where(is_nan[idx], -np.inf, values[idx]), is_nan[idx], codes))
+        sorted_codes = codes[order] * 2 + is_nan[idx][order]
+        starts = np.flatnonzero(np.r_[True, sorted_codes[1:] != sorted_codes[:-1]])
+        rank = np.arange(len(order)) - np.repeat(starts, np.diff(np.r_[starts, len(order)]))
+        idx = np.sort(idx[order[rank < k]])
+
+        rows = chunk.iloc[idx]
+        for pos, key, value, row in zip(rows.index, keys.iloc[idx], values[idx],
+                                        rows.itertuples(index=False, name=None)):
+            if np.isnan(value):
+                kept = nans.setdefault(key, [])
+                if len(kept) < k:
+                    kept.append((pos, row))
+                continue
+            heap = heaps.setdefault(key, [])
+            item = (value, -pos, row)
+            if len(heap) < k:
+                heappush(heap, item)
+            elif item[:2] > heap[0][:2]:
+                heapreplace(heap, item)
+
+    index, records = [], []
+    for key in sorted(set(heaps) | set(nans)):
+        best = [(-neg_pos, row) for _, neg_pos, row in sorted(heaps.get(key, []), reverse=True)]
+        for pos, row in (best + nans.get(key, []))[:k]:
+            index.append(pos)
+            records.append(row)
+    if columns is None:
+        return pd.DataFrame()
+    top = pd.DataFrame.from_records(records, columns=columns, index=pd.Index(index, dtype=np.int64))
+    return top.astype(dtypes)
+
+
+def _crosstab(df, col):
+    ct = pd.crosstab(df[col], df["Churn"])
+    ct["churn_rate"] = ct.get(True, 0) / ct.sum(axis=1)
+    return ct
+
+
+def summarize(df):
+    """Все результаты п. 1–8 по фрейму в памяти (добавляет столбцы Avg call duration и Predicted churn)."""
+    res = {"rows": len(df), "na": df.isna().sum(), "describe": df.describe(),
+           "churn": df["Churn"].value_counts(dropna=False)}
+    add_avg_duration(df)
+    res["top"] = top_k_rows([df], "Avg call duration", TOP_K)
+    if TOP_BY:
+        res["top_by"] = top_k_rows([df], "Avg call duration", TOP_K, by=TOP_BY)
+    res["duration_mean"] = df.groupby("Churn")["Avg call duration"].mean()
+    res["calls_mean"] = df.groupby("Churn")["Customer service calls"].mean()
+    res["ct_calls"] = _crosstab(df, "Customer service calls")
+    res["ct_plan"] = _crosstab(df, "International plan")
+    df["Predicted churn"] = predict(df)
+    res["confusion"] = confusion(df["Churn"].astype(bool), df["Predicted churn"].astype(bool))
+    return res
+
+
+# ---------- потоковый режим: частичные агрегаты по кускам и их слияние ----------
+
+def chunk_aggregates(chunk):
+    """
+    Складываемые агрегаты одного куска: пропуски, частоты значений числовых
+    столбцов (из них — точный describe; None, если различных значений больше
+    VALUE_COUNTS_MAX) и их моменты, частоты Churn, суммы/количества по
+    группам Churn, ячейки двух таблиц сопряжённости, матрица ошибок и
+    TOP_K строк по Avg call duration (и по группам TOP_BY) (индекс — номер строки внутри куска).
+    """
+    numeric = chunk.select_dtypes("number").columns
+    agg = {
+        "rows": len(chunk),
+        "na": chunk.isna().sum(),
+        "values": {col: _capped(chunk[col].value_counts()) for col in numeric},
+        "moments": {col: _moments(chunk[col]) for col in numeric},
+        "churn": chunk["Churn"].value_counts(dropna=False),
+    }
+    add_avg_duration(chunk)
+    agg["top"] = top_k_rows([chunk], "Avg call duration", TOP_K)
+    if TOP_BY:
+        agg["top_by"] = top_k_rows([chunk], "Avg call duration", TOP_K, by=TOP_BY)
+    agg["by_churn"] = chunk.groupby("Churn")[["Avg call duration", "Customer service calls"]].agg(["sum", "count"])
+    agg["ct_calls"] = chunk.groupby(["Customer service calls", "Churn"]).size()
+    agg["ct_plan"] = chunk.groupby(["International plan", "Churn"]).size()
+    agg["confusion"] = np.array(confusion(chunk["Churn"].astype(bool), predict(chunk).astype(bool)))
+    return agg
+
+
+def _add(a, b):
+    return a.add(b, fill_value=0)
+
+
+def _capped(counts):
+    return counts if counts is not None and len(counts) <= VALUE_COUNTS_MAX else None
+
+
+def _moments(s):
+    """[n, среднее, сумма квадратов отклонений, min, max] непустых значений."""
+    v = s.dropna().to_numpy(dtype=float)
+    if not len(v):
+        return np.array([0.0, 0.0, 0.0, np.inf, -np.inf])
+    mean = v.mean()
+    return np.array([len(v), mean, ((v - mean) ** 2).sum(), v.min(), v.max()])
+
+
+def _merge_moments(a, b):
+    # формулы Chan et al. для среднего и суммы квадратов отклонений
+    if not b[0]:
+        return a
+    if not a[0]:
+        return b
+    n = a[0] + b[0]
+    delta = b[1] - a[1]
+    return np.array([n, a[1] + delta * b[0] / n, a[2] + b[2] + delta ** 2 * a[0] * b[0] / n,
+                     min(a[3], b[3]), max(a[4], b[4])])
+
+
+def merge_aggregates(a, b):
+    """Слияние частичных агрегатов двух кусков (a — более ранний кусок; индексы top уже глобальные)."""
+    merged = {
+        "rows": a["rows"] + b["rows"],
+        "na": _add(a["na"], b["na"]),
+        "values": {col: _capped(_add(a["values"][col], b["values"][col])
+                                if a["values"][col] is not None and b["values"][col] is not None else None)
+                   for col in a["values"]},
+        "moments": {col: _merge_moments(a["moments"][col], b["moments"][col]) for col in a["moments"]},
+        "churn": _add(a["churn"], b["churn"]),
+        "top": top_k_rows([a["top"], b["top"]], "Avg call duration", TOP_K),
+        "by_churn": _add(a["by_churn"], b["by_churn"]),
+        "ct_calls": _add(a["ct_calls"], b["ct_calls"]),
+        "ct_plan": _add(a["ct_plan"], b["ct_plan"]),
+        "confusion": a["confusion"] + b["confusion"],
+    }
+    if "top_by" in a:
+        merged["top_by"] = top_k_rows([a["top_by"], b["top_by"]], "Avg call duration", TOP_K, by=TOP_BY)
+    return merged
+
+
+def _lerp(a, b, t):
+    # та же формула, что у np.quantile(method="linear")
+    return b - (b - a) * (1 - t) if t >= 0.5 else a + (b - a) * t
+
+
+def _describe_from_counts(counts):
+    """describe() столбца по его частотам значений (квантили — точно, как у pandas)."""
+    counts = counts.sort_index()
+    values = counts.index.to_numpy(dtype=float)
+    c = counts.to_numpy(dtype=np.int64)
+    n = int(c.sum())
+    if n == 0:
+        return [0.0] + [np.nan] * 7
+    mean = float((values * c).sum() / n)
+    std = float(np.sqrt((c * (values - mean) ** 2).sum() / (n - 1))) if n > 1 else np.nan
+    cum = np.cumsum(c)
+    quantiles = []
+    for p in (0.25, 0.5, 0.75):
+        pos = p * (n - 1)
+        lo = int(np.floor(pos))
+        a = values[np.searchsorted(cum, lo, side="right")]
+        b = values[np.searchsorted(cum, min(lo + 1, n - 1), side="right")]
+        quantiles.append(_lerp(a, b, pos - lo))
+    return [float(n), mean, std, values[0], *quantiles, values[-1]]
+
+
+def _quantile_ranks(n):
+    """Ранги (по возрастанию, с 0), между которыми интерполируются квартили describe()."""
+    ranks = []
+    for p in (0.25, 0.5, 0.75):
+        lo = int(np.floor(p * (n - 1)))
+        ranks.append((lo, min(lo + 1, n - 1), p * (n - 1) - lo))
+    return ranks
+
+
+def _describe_from_moments(moments, at_rank):
+    """describe() столбца по моментам и точным значениям по рангам (at_rank[rank])."""
+    n, mean, m2, lo, hi = moments
+    std = float(np.sqrt(m2 / (n - 1))) if n > 1 else np.nan
+    quantiles = [_lerp(at_rank[a], at_rank[b], t) for a, b, t in _quantile_ranks(int(n))]
+    return [float(n), float(mean), std, lo, *quantiles, hi]
+
+
+def results_from_aggregates(agg, at_rank=None):
+    """
+    Результаты п. 1–8 в том же виде, что и summarize(), из слитых агрегатов.
+    at_rank — {столбец: {ранг: значение}} для столбцов без частот значений.
+    """
+    describe = pd.DataFrame({col: _describe_from_counts(counts) if counts is not None
+                             else _describe_from_moments(agg["moments"][col], at_rank[col])
+                             for col, counts in agg["values"].items()},
+                            index=["count", "mean", "std", "min", "25%", "50%", "75%", "max"])
+    by_churn = agg["by_churn"]
+
+    def group_mean(col):
+        return (by_churn[(col, "sum")] / by_churn[(col, "count")]).rename(col)
+
+    def crosstab(cells):
+        ct = cells.astype(np.int64).unstack(fill_value=0)
+        ct["churn_rate"] = ct.get(True, 0) / ct.sum(axis=1)
+        return ct
+
+    res = {
+        "rows": agg["rows"],
+        "na": agg["na"].astype(np.int64),
+        "describe": describe,
+        "churn": agg["churn"].astype(np.int64).sort_values(ascending=False),
+        "top": agg["top"],
+        "duration_mean": group_mean("Avg call duration"),
+        "calls_mean": group_mean("Customer service calls"),
+        "ct_calls": crosstab(agg["ct_calls"]),
+        "ct_plan": crosstab(agg["ct_plan"]),
+        "confusion": tuple(int(x) for x in agg["confusion"]),
+    }
+    if "top_by" in agg:
+        res["top_by"] = agg["top_by"]
+    return res
+
+
+def _chunk_ranges(path, chunk_bytes):
+    """Заголовок CSV и границы кусков [start, end) в байтах после него."""
+    with open(path, "rb") as f:
+        header = f.readline()
+    size = os.path.getsize(path)
+    starts = range(len(header), size, chunk_bytes)
+    return pd.read_csv(io.BytesIO(header)).columns.tolist(), [(s, min(s + chunk_bytes, size)) for s in starts]
+
+
+def _read_range(path, names, start, end):
+    """Строки, начинающиеся в байтах [start, end): обрезанная первая строка — у предыдущего куска."""
+    with open(path, "rb") as f:
+        f.seek(start - 1)
+        if f.read(1) != b"\n":
+            f.readline()
+        data = f.read(max(end - f.tell(), 0))
+        if data and not data.endswith(b"\n"):
+            data += f.readline()
+    if not data.strip():
+        return pd.read_csv(io.BytesIO(b""), names=names, usecols=use_cols)
+    return pd.read_csv(io.BytesIO(data), header=None, names=names, usecols=use_cols)
+
+
+def _aggregate_range(task):
+    path, names, start, end = task
+    return chunk_aggregates(_read_range(path, names, start, end))
+
+
+_KEY_BITS = 16
+_TOP = np.uint64(1 << 63)
+
+
+def _sort_keys(values):
+    """float64 -> uint64 с тем же порядком (знаковый бит и инверсия для отрицательных)."""
+    bits = np.ascontiguousarray(values, dtype=float).view(np.uint64)
+    return np.where(bits & _TOP, ~bits, bits | _TOP)
+
+
+def _from_key(key):
+    key = np.uint64(key)
+    bits = key ^ _TOP if key & _TOP else ~key
+    return float(np.array([bits], dtype=np.uint64).view(float)[0])
+
+
+def _rank_answers(task):
+    """
+    Ответы куска на запросы (столбец, уровень, префикс, собрать ли): значения,
+    у ключа которых старшие 16 * уровень бит равны префиксу, — сами значения
+    или гистограмма следующих 16 бит ключа.
+    """
+    path, names, start, end, queries = task
+    chunk = _read_range(path, names, start, end)
+    answers = {}
+    for query in queries:
+        col, level, prefix, collect = query
+        values = chunk[col].dropna().to_numpy(dtype=float)
+        keys = _sort_keys(values)
+        if level:
+            sel = (keys >> np.uint64(64 - _KEY_BITS * level)) == np.uint64(prefix)
+            values, keys = values[sel], keys[sel]
+        if collect:
+            answers[query] = values
+        else:
+            cells = (keys >> np.uint64(64 - _KEY_BITS * (level + 1))) & np.uint64((1 << _KEY_BITS) - 1)
+            answers[query] = np.bincount(cells.astype(np.int64), minlength=1 << _KEY_BITS)
+    return answers
+
+
+def values_at_ranks(path, names, ranges, ranks, pool=None):
+    """
+    Точные значения столбцов по рангам ({столбец: [ранг, ...]}, NaN не считаются)
+    проходами по кускам файла. Значения переводятся в 64-битные ключи того же
+    порядка; каждый проход уточняет 16 бит ключа по гистограмме, а когда в
+    ячейке ранга остаётся не больше VALUE_COUNTS_MAX значений — собирает их.
+    В памяти — кусок и гистограммы 2^16 ячеек, сколько бы ни было строк.
+    """
+    # цель: [столбец, ранг, ранг внутри ячейки, уровень, префикс, значений в ячейке]
+    targets = [[col, r, r, 0, 0, np.inf] for col, rs in ranks.items() for r in sorted(set(rs))]
+    result = {col: {} for col in ranks}
+    while targets:
+        queries = sorted({(t[0], t[3], t[4], bool(t[5] <= VALUE_COUNTS_MAX)) for t in targets})
+        tasks = [(path, names, start, end, queries) for start, end in ranges]
+        answers = {}
+        for part in (pool.map(_rank_answers, tasks) if pool else map(_rank_answers, tasks)):
+            for query, answer in part.items():
+                if query not in answers:
+                    answers[query] = answer
+                elif query[3]:
+                    answers[query] = np.concatenate([answers[query], answer])
+                else:
+                    answers[query] += answer
+        for t in targets:
+            answer = answers[(t[0], t[3], t[4], bool(t[5] <= VALUE_COUNTS_MAX))]
+            if t[5] <= VALUE_COUNTS_MAX:
+                result[t[0]][t[1]] = float(np.sort(answer)[t[2]])
+                continue
+            cum = np.cumsum(answer)
+            cell = int(np.searchsorted(cum, t[2], side="right"))
+            t[2] -= int(cum[cell - 1]) if cell else 0
+            t[3] += 1
+            t[4] = (t[4] << _KEY_BITS) | cell
+            t[5] = int(answer[cell])
+            if t[3] * _KEY_BITS == 64:            # известны все биты ключа
+                result[t[0]][t[1]] = _from_key(t[4])
+        targets = [t for t in targets if t[1] not in result[t[0]]]
+    return result
+
+
+def summarize_chunked(path=CSV_PATH, chunk_bytes=64 * 2**20, workers=1):
+    """
+    Потоковый режим: файл делится на куски по байтам, каждый кусок читается и
+    сворачивается в агрегаты отдельно (при workers > 1 — в пуле процессов),
+    затем агрегаты складываются по порядку. Памяти нужно на один кусок.
+    Квартили столбцов, у которых частот значений слишком много, — ещё
+    проходами по файлу (values_at_ranks).
+    """
+    names, ranges = _chunk_ranges(path, chunk_bytes)
+    tasks = [(path, names, start, end) for start, end in ranges]
+    with ProcessPoolExecutor(max_workers=workers) if workers > 1 else nullcontext() as pool:
+        parts = list(pool.map(_aggregate_range, tasks)) if pool else [_aggregate_range(task) for task in tasks]
+        offset = 0
+        for part in parts:
+            for name in ("top", "top_by"):
+                if name in part:
+                    part[name].index += offset
+            offset += part["rows"]
+        # кусок без начала строки (кусок меньше строки) читается пустым фреймом без числовых столбцов — не сливаем
+        parts = [part for part in parts if part["rows"]]
+        if not parts:
+            raise ValueError(f"{path}: в CSV нет строк данных")
+        agg = reduce(merge_aggregates, parts)
+
+        ranks = {col: [r for a, b, _ in _quantile_ranks(int(agg["moments"][col][0])) for r in (a, b)]
+                 for col, counts in agg["values"].items() if counts is None}
+        at_rank = values_at_ranks(path, names, ranges, ranks, pool) if ranks else None
+    return results_from_aggregates(agg, at_rank)
+
+
+def print_report(res):
+    print("=== Пропуски по столбцам ===")
+    print(res["na"])
+
+    print("\n=== Описательная статистика (числовые) ===")
+    print(res["describe"])
+
+    print("\n=== value_counts по Churn ===")
+    counts = res["churn"]
+    print(counts)
+    print("\nПроценты (%):")
+    print((counts / res["rows"] * 100).round(2))
+
+    print(f"\n=== Топ-{TOP_K} по средней длительности звонка ===")
+    print(res["top"])
+    if "top_by" in res:
+        print(f"\n=== Топ-{TOP_K} по средней длительности звонка в каждой группе {TOP_BY} ===")
+        print(res["top_by"])
+
+    print("\n=== Средняя длительность звонка по группам Churn ===")
+    print(res["duration_mean"])
+
+    print("\n=== Среднее число звонков в поддержку по группам Churn ===")
+    print(res["calls_mean"])
+
+    print("\n=== Crosstab: Customer service calls × Churn ===")
+    print(res["ct_calls"])
+
+    print("\n=== Crosstab: International plan × Churn ===")
+    print(res["ct_plan"])
+
+    tn, fp, fn, tp = res["confusion"]
+    fp_rate = fp / (fp + tn) if (fp + tn) > 0 else float("nan")
+    fn_rate = fn / (fn + tp) if (fn + tp) > 0 else float("nan")
+
+    print("\n=== Оценка ошибок правила (Predicted churn) ===")
+    print(f"FP={fp}, FN={fn}, TN={tn}, TP={tp}")
+    print(f"Ошибка I рода (ложноположительные): {fp_rate:.3f}")
+    print(f"Ошибка II рода (ложноотрицательные): {fn_rate:.3f}")
+    return fp_rate, fn_rate
+
+
+def main():
+    if CHUNK_BYTES:
+        print_report(summarize_chunked(CSV_PATH, CHUNK_BYTES, CHUNK_WORKERS))
+        return
+
+    df = pd.read_csv(CSV_PATH, usecols=use_cols)
+    fp_rate, fn_rate = print_report(summarize(df))
+
+    # 9) Поиск правил: все пороги по числовым столбцам OR флаги, Парето-фронт ошибок I/II рода
+    front = search_rules(df.drop(columns=["Predicted churn"]))
+    print("\n=== Парето-фронт правил (ошибка I рода / ошибка II рода) ===")
+    print(front[["rule", "FP", "FN", "TN", "TP", "fp_rate", "fn_rate"]].to_string())
+    better = front[(front["fp_rate"] <= fp_rate) & (front["fn_rate"] <= fn_rate)]
+    print(f"\nПравил фронта не хуже исходного по обеим ошибкам: {len(better)}")
+    if len(better):
+        print(better[["rule", "fp_rate", "fn_rate"]].to_string())
+
+
+if __name__ == "__main__":
+    main()
@@ -1,162 +1,860 @@
+import csv
+import hashlib
+from collections import Counter
+import inspect
+import io
+import os
+import pickle
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+
+import matplotlib
+matplotlib.use("Agg")   # графики только сохраняются в файлы — окно не нужно, в процессах пула тоже
+
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 import seaborn as sns
-import os
-from datetime import datetime
+from matplotlib import cbook
+from matplotlib.colors import LogNorm, to_rgb
+from matplotlib.patches import Patch
+from PIL import Image
 
 # -------------------------------------------
 # 1. Настройки
 # -------------------------------------------
 CSV_PATH = "weather1.csv"           # путь к файлу
 OUT_DIR = "lab05_results"           # папка для сохранения графиков
-os.makedirs(OUT_DIR, exist_ok=True)
+DPI = 150
+RENDER_WORKERS = 1                  # > 1 — графики рисуются параллельно в пуле процессов
+HASH_KEY = "Source-Hash"            # поле PNG с хэшем данных и параметров графика
+TYPED_CACHE = CSV_PATH + ".typed.pkl"   # типизированные нужные столбцы; пересобирается при изменении размера/mtime CSV
+TIME_FORMAT = "%d.%m.%Y %H:%M"          # формат local_time в выгрузке rp5
+RENDER_MODE = "auto"                # "points" — каждая точка; "aggregate" — плотность и LTTB; "auto" — по AGGREGATE_ROWS
+AGGREGATE_ROWS = 50_000             # в режиме "auto" больше стольких строк — агрегированная отрисовка
+DENSITY_BINS = 200                  # ячеек по каждой оси у 2-D гистограммы T/U
+LINE_POINTS = 2000                  # точек ряда температуры после LTTB (~ ширина графика в пикселях)
+CHUNK_ROWS = None                   # число — файл читается кусками, графики строятся по сводкам (память не растёт с архивом)
+TDIGEST_COMPRESSION = 200           # точность t-digest: центроидов ~ COMPRESSION / 2
+EXACT_QUANTILES = 20_000            # пока значений в группе не больше — квантили считаются точно
+BOX_EXTREMES = 20_000               # крайних значений с каждой стороны хранится для усов и выбросов
+INCREMENTAL = False                 # True — разбираются только строки, дописанные в CSV с прошлого запуска
+INGEST_STATE = CSV_PATH + ".ingest.pkl"   # сводки + позиция в файле для инкрементального режима
+INGEST_BLOCK_BYTES = 16 * 2**20     # новые строки разбираются блоками такого размера
+
 
 # -------------------------------------------
 # 2. Загрузка данных (cp1251, ; , " )
 # -------------------------------------------
-df = pd.read_csv(CSV_PATH, sep=';', encoding='cp1251', quotechar='"', low_memory=False)
+# Точные столбцы, которые нужны в ЛР (кроме времени — первого столбца)
+NUMERIC_COLS = ["T", "P", "U", "Ff", "N", "H", "VV"]
 
-# Переименуем первый столбец
-df = df.rename(columns={df.columns[0]: "local_time"})
 
-# Точные столбцы, которые нужны в ЛР
-needed_cols = ["local_time", "T", "P", "U", "Ff", "N", "H", "VV"]
+def _read_header(path):
+    with open(path, encoding='cp1251', newline="") as f:
+        return next(csv.reader(f, delimiter=';', quotechar='"'))
 
-# Если какого-то столбца нет — добавим пустой (чтобы код не падал)
-for col in needed_cols:
-    if col not in df.columns:
-        df[col] = np.nan
 
-# -------------------------------------------
-# 3. Преобразование типов
-# -------------------------------------------
-# local_time → datetime
-df["local_time_parsed"] = pd.to_datetime(df["local_time"], errors='coerce', dayfirst=True)
+def parse_local_time(s):
+    """
+    local_time -> datetime. Быстрый путь: строки ровно вида TIME_FORMAT
+    разбираются как массив символов фиксированной ширины (цифры -> числа ->
+    datetime64) без разбора каждой строки по отдельности. Остальные непустые
+    строки (например, без ведущих нулей) — через pd.to_datetime(format=TIME_FORMAT),
+    а если формат не подошёл ни одной строке — как раньше, с выводом формата (dayfirst=True).
+    """
+    chars = s.fillna("").to_numpy(dtype="U17").view(np.uint32).reshape(len(s), 17)
+    c = chars[:, :16].astype(np.int64) - ord("0")
 
-# Приведение остальных столбцов к числам
-for col in ["T", "P", "U", "Ff", "N", "H", "VV"]:
-    df[col] = pd.to_numeric(df[col], errors='coerce')
+    def number(positions):
+        value = np.zeros(len(s), dtype=np.int64)
+        for j in positions:
+            value = value * 10 + c[:, j]
+        return value
 
-# -------------------------------------------
-# 4. Scatter: T vs U
-# -------------------------------------------
-plt.figure(figsize=(7, 5))
-plt.scatter(df["T"], df["U"], alpha=0.6)
-plt.xlabel("Температура T (°C)")
-plt.ylabel("Влажность U (%)")
-plt.title("Диаграмма рассеяния: T vs U")
-plt.tight_layout()
-plt.savefig(f"{OUT_DIR}/scatter_T_U.png", dpi=150)
-plt.close()
+    digits = [0, 1, 3, 4, 6, 7, 8, 9, 11, 12, 14, 15]
+    ok = (chars[:, 16] == 0) & np.all((c[:, digits] >= 0) & (c[:, digits] <= 9), axis=1)
+    for j, sep in ((2, "."), (5, "."), (10, " "), (13, ":")):
+        ok &= c[:, j] == ord(sep) - ord("0")
+    day, mon, year = number([0, 1]), number([3, 4]), number([6, 7, 8, 9])
+    hour, minute = number([11, 12]), number([14, 15])
 
-# -------------------------------------------
-# 5. Scatter с раскраской по облачности N (100 — синий, остальные — красный)
-# -------------------------------------------
-mask100 = df["N"] == 100
-
-plt.figure(figsize=(7, 5))
-plt.scatter(df.loc[mask100, "T"], df.loc[mask100, "U"], alpha=0.7, c="blue", label="N = 100")
-plt.scatter(df.loc[~mask100, "T"], df.loc[~mask100, "U"], alpha=0.5, c="red", label="N ≠ 100")
-plt.xlabel("Температура T (°C)")
-plt.ylabel("Влажность U (%)")
-plt.title("T vs U с выделением облачности N = 100")
-plt.legend()
-plt.tight_layout()
-plt.savefig(f"{OUT_DIR}/scatter_T_U_colored.png", dpi=150)
-plt.close()
+    month = ((year - 1970) * 12 + mon - 1).astype("datetime64[M]")
+    date = month.astype("datetime64[D]") + (day - 1)
+    # 31.02 и т.п. перешли бы в следующий месяц — такие строки не годятся
+    ok &= (mon >= 1) & (mon <= 12) & (day >= 1) & (hour < 24) & (minute < 60)
+    ok &= date.astype("datetime64[M]") == month
+    stamps = date.astype("datetime64[us]") + (hour * 60 + minute).astype("timedelta64[m]")
+    stamps[~ok] = np.datetime64("NaT")
+    parsed = pd.Series(stamps, index=s.index)
 
-# -------------------------------------------
-# 6. Линейный график температуры по времени
-# -------------------------------------------
-df_time = df.dropna(subset=["local_time_parsed", "T"]).sort_values("local_time_parsed")
-
-plt.figure(figsize=(10, 5))
-plt.plot(df_time["local_time_parsed"], df_time["T"], marker="o", markersize=3)
-plt.xlabel("Время")
-plt.ylabel("Температура T (°C)")
-plt.title("Температура по времени")
-plt.gcf().autofmt_xdate()
-plt.tight_layout()
-plt.savefig(f"{OUT_DIR}/line_temperature.png", dpi=150)
-plt.close()
+    rest = ~ok & s.notna().to_numpy()
+    if not ok.any():
+        return pd.to_datetime(s, errors='coerce', dayfirst=True)
+    if rest.any():
+        parsed[rest] = pd.to_datetime(s[rest], format=TIME_FORMAT, errors='coerce')
+    return parsed
 
-# -------------------------------------------
-# 7. Среднемесячная температура (bar chart)
-# -------------------------------------------
-df["month"] = df["local_time_parsed"].dt.month
-monthly_avg = df.dropna(subset=["month", "T"]).groupby("month")["T"].mean()
-
-plt.figure(figsize=(8, 5))
-sns.barplot(x=monthly_avg.index, y=monthly_avg.values)
-plt.xlabel("Месяц")
-plt.ylabel("Средняя температура (°C)")
-plt.title("Среднемесячная температура")
-plt.tight_layout()
-plt.savefig(f"{OUT_DIR}/bar_monthly_avg_T.png", dpi=150)
-plt.close()
 
-# -------------------------------------------
-# 8. Горизонтальная диаграмма количества наблюдений по облачности N
-# -------------------------------------------
-counts_N = df["N"].value_counts().sort_index()
+def _to_number(s):
+    """pd.to_numeric(errors='coerce') -> float по словарю категорий, а не по каждой строке."""
+    if not len(s.cat.categories):           # столбец пуст во всём файле/куске
+        return pd.Series(np.nan, index=s.index)
+    values = pd.to_numeric(pd.Series(s.cat.categories), errors='coerce').to_numpy(dtype=float)
+    codes = s.cat.codes.to_numpy()
+    return pd.Series(np.where(codes >= 0, values[codes], np.nan), index=s.index)
+
+
+def _read_options(path):
+    """
+    Параметры read_csv: только нужные столбцы, типы заданы заранее. Все
+    измеряемые столбцы читаются категориями: в N/H/VV rp5 пишет и слова
+    ("100%.", "менее 0.1"), а различных значений в каждом столбце намного
+    меньше, чем строк, — к числу (нечисловое -> NaN) приводится только словарь.
+    """
+    names = _read_header(path)
+    present = [col for col in NUMERIC_COLS if col in names]
+    return names[0], dict(sep=';', encoding='cp1251', quotechar='"', usecols=[names[0]] + present,
+                          dtype={names[0]: str, **{col: "category" for col in present}})
+
+
+def _typed(df, time_col):
+    # Переименуем первый столбец
+    df = df.rename(columns={time_col: "local_time"})
+
+    # Если какого-то столбца нет — добавим пустой (чтобы код не падал)
+    for col in NUMERIC_COLS:
+        df[col] = _to_number(df[col]) if col in df.columns else np.nan
+
+    df["local_time_parsed"] = parse_local_time(df["local_time"])
+    return df
+
+
+def read_weather(path=CSV_PATH):
+    time_col, options = _read_options(path)
+    return _typed(pd.read_csv(path, **options), time_col)
+
+
+def iter_weather(path=CSV_PATH, chunk_rows=100_000):
+    """Тот же разбор, что у read_weather, кусками по chunk_rows строк."""
+    time_col, options = _read_options(path)
+    with pd.read_csv(path, chunksize=chunk_rows, **options) as reader:
+        for chunk in reader:
+            yield _typed(chunk, time_col)
+
+
+def _cache_key(path):
+    """Размер и mtime CSV плюс настройки разбора: при их смене кэш недействителен."""
+    st = os.stat(path)
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns,
+            "time_format": TIME_FORMAT, "numeric_cols": list(NUMERIC_COLS)}
+
+
+def load_weather(path=CSV_PATH, cache_path=None):
+    """
+    read_weather() через pickle-кэш рядом с CSV (действителен, пока не изменились
+    размер и mtime файла и настройки разбора). Если кэш записать нельзя — работаем без него.
+    """
+    cache_path = cache_path or path + ".typed.pkl"
+    key = _cache_key(path)
+    try:
+        with open(cache_path, "rb") as f:
+            cached = pickle.load(f)
+        if cached["source"] == key:
+            return cached["df"]
+    except (OSError, EOFError, KeyError, TypeError, pickle.UnpicklingError):
+        pass
+    df = read_weather(path)
+    if _cache_key(path) != key:             # CSV переписали во время разбора
+        return df
+    tmp = cache_path + ".tmp"
+    try:
+        with open(tmp, "wb") as f:
+            pickle.dump({"source": key, "df": df}, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, cache_path)
+    except OSError as e:
+        warnings.warn(f"Кэш {cache_path} не записан ({e}); работаем без него.")
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    return df
 
-plt.figure(figsize=(8, 6))
-plt.barh(counts_N.index.astype(str), counts_N.values)
-plt.xlabel("Количество наблюдений")
-plt.ylabel("N — облачность")
-plt.title("Количество наблюдений по облачности N")
-plt.tight_layout()
-plt.savefig(f"{OUT_DIR}/hbar_cloudiness_counts.png", dpi=150)
-plt.close()
 
 # -------------------------------------------
-# 9. Гистограмма температуры T (10 корзин)
+# Графики: каждая функция рисует одну фигуру по своему срезу данных
 # -------------------------------------------
-plt.figure(figsize=(7, 5))
-plt.hist(df["T"].dropna(), bins=10, edgecolor="black")
-plt.xlabel("Температура T (°C)")
-plt.ylabel("Частота")
-plt.title("Гистограмма температуры (10 интервалов)")
-plt.tight_layout()
-plt.savefig(f"{OUT_DIR}/hist_T_10bins.png", dpi=150)
-plt.close()
+def draw_scatter(data):
+    """4. Scatter: T vs U"""
+    plt.figure(figsize=(7, 5))
+    plt.scatter(data["T"], data["U"], alpha=0.6)
+    plt.xlabel("Температура T (°C)")
+    plt.ylabel("Влажность U (%)")
+    plt.title("Диаграмма рассеяния: T vs U")
+
+
+def draw_scatter_colored(data):
+    """5. Scatter с раскраской по облачности N (100 — синий, остальные — красный)"""
+    mask100 = data["N"] == 100
+
+    plt.figure(figsize=(7, 5))
+    plt.scatter(data.loc[mask100, "T"], data.loc[mask100, "U"], alpha=0.7, c="blue", label="N = 100")
+    plt.scatter(data.loc[~mask100, "T"], data.loc[~mask100, "U"], alpha=0.5, c="red", label="N ≠ 100")
+    plt.xlabel("Температура T (°C)")
+    plt.ylabel("Влажность U (%)")
+    plt.title("T vs U с выделением облачности N = 100")
+    plt.legend()
+
+
+def draw_line(data):
+    """6. Линейный график температуры по времени"""
+    plt.figure(figsize=(10, 5))
+    plt.plot(data["local_time_parsed"], data["T"], marker="o", markersize=3)
+    plt.xlabel("Время")
+    plt.ylabel("Температура T (°C)")
+    plt.title("Температура по времени")
+    plt.gcf().autofmt_xdate()
+
+
+def draw_density(data):
+    """4. T vs U как 2-D гистограмма: цвет — число наблюдений в ячейке (лог. шкала)"""
+    counts, t_edges, u_edges = data
+    plt.figure(figsize=(7, 5))
+    plt.pcolormesh(t_edges, u_edges, np.ma.masked_equal(counts.T, 0), norm=LogNorm(), cmap="viridis")
+    plt.colorbar(label="Число наблюдений")
+    plt.xlabel("Температура T (°C)")
+    plt.ylabel("Влажность U (%)")
+    plt.title("Диаграмма рассеяния: T vs U")
+
+
+def draw_density_colored(data):
+    """5. То же с выделением N = 100: оттенок — доля N = 100 в ячейке, непрозрачность — число наблюдений"""
+    counts100, counts_other, t_edges, u_edges = data
+    total = counts100 + counts_other
+    share = np.divide(counts100, total, out=np.zeros_like(total, dtype=float), where=total > 0)
+    rgba = np.empty(total.shape + (4,))
+    rgba[..., :3] = share[..., None] * to_rgb("blue") + (1 - share[..., None]) * to_rgb("red")
+    rgba[..., 3] = np.log1p(total) / np.log1p(total.max()) if total.max() > 0 else 0
+
+    plt.figure(figsize=(7, 5))
+    plt.imshow(rgba.transpose(1, 0, 2), origin="lower", aspect="auto", interpolation="nearest",
+               extent=(t_edges[0], t_edges[-1], u_edges[0], u_edges[-1]))
+    plt.xlabel("Температура T (°C)")
+    plt.ylabel("Влажность U (%)")
+    plt.title("T vs U с выделением облачности N = 100")
+    plt.legend(handles=[Patch(color="blue", label="N = 100"), Patch(color="red", label="N ≠ 100")])
+
+
+def draw_monthly(monthly_avg):
+    """7. Среднемесячная температура (bar chart)"""
+    plt.figure(figsize=(8, 5))
+    sns.barplot(x=monthly_avg.index, y=monthly_avg.values)
+    plt.xlabel("Месяц")
+    plt.ylabel("Средняя температура (°C)")
+    plt.title("Среднемесячная температура")
+
+
+def draw_cloudiness(counts_N):
+    """8. Горизонтальная диаграмма количества наблюдений по облачности N"""
+    plt.figure(figsize=(8, 6))
+    plt.barh(counts_N.index.astype(str), counts_N.values)
+    plt.xlabel("Количество наблюдений")
+    plt.ylabel("N — облачность")
+    plt.title("Количество наблюдений по облачности N")
+
+
+def draw_hist(t_counts):
+    """9. Гистограмма температуры T (10 корзин) по частотам значений T"""
+    plt.figure(figsize=(7, 5))
+    plt.hist(t_counts.index.to_numpy(dtype=float), bins=10, weights=t_counts.to_numpy(), edgecolor="black")
+    plt.xlabel("Температура T (°C)")
+    plt.ylabel("Частота")
+    plt.title("Гистограмма температуры (10 интервалов)")
+
+
+def draw_boxplots(stats):
+    """10. Boxplot давления P в зависимости от видимости VV (по готовым статистикам ящиков)"""
+    plt.figure(figsize=(8, 6))
+    plt.gca().bxp(stats)
+    plt.ylabel("Давление P (мм рт. ст.)")
+    plt.title("Распределение давления по группам видимости")
+
+
+def draw_pie(h_plot):
+    """11. Pie chart по основанию облаков (H)"""
+    plt.figure(figsize=(7, 7))
+    plt.pie(h_plot.values, labels=h_plot.index,
+            autopct="%1.1f%%", startangle=90)
+    plt.title("Распределение высоты основания облаков H")
+
 
 # -------------------------------------------
-# 10. Boxplot давления P в зависимости от видимости VV
+# Сводки за один проход (складываются по кускам)
 # -------------------------------------------
+class TDigest:
+    """
+    t-digest (Dunning): распределение как набор центроидов (среднее, вес),
+    мелких у краёв и крупных в середине, — квантили хвостов точнее. Два
+    дайджеста складываются (merge), объём — O(compression). Пока значений
+    не больше exact_limit, они хранятся как есть и квантили точные.
+    """
+
+    def __init__(self, compression=TDIGEST_COMPRESSION, exact_limit=EXACT_QUANTILES):
+        self.compression = compression
+        self.exact_limit = exact_limit
+        self.exact = True
+        self.means = np.empty(0)
+        self.weights = np.empty(0)
+        self.min, self.max = np.inf, -np.inf
+
+    @property
+    def count(self):
+        return float(self.weights.sum())
+
+    def update(self, values):
+        values = np.asarray(values, dtype=float)
+        values = values[~np.isnan(values)]
+        self._add(values, np.ones(len(values)))
+        return self
+
+    def merge(self, other):
+        self.exact = self.exact and other.exact
+        self._add(other.means, other.weights)
+        return self
+
+    def _add(self, means, weights):
+        if not len(means):
+            return
+        self.min = min(self.min, float(means.min()))
+        self.max = max(self.max, float(means.max()))
+        self.means = np.concatenate([self.means, means])
+        self.weights = np.concatenate([self.weights, weights])
+        if self.exact and len(self.means) > self.exact_limit:
+            self.exact = False
+        if not self.exact and len(self.means) > 5 * self.compression:
+            self._compress()
+
+    def _compress(self):
+        # шкала k1: k(q) = δ/2π · asin(2q - 1); центроид — точки с одинаковым floor(k)
+        order = np.argsort(self.means, kind="stable")
+        means, weights = self.means[order], self.weights[order]
+        q = (np.cumsum(weights) - weights / 2) / weights.sum()
+        k = np.floor(self.compression / (2 * np.pi) * np.arcsin(2 * q - 1) + self.compression / 4)
+        _, group = np.unique(k, return_inverse=True)
+        self.weights = np.bincount(group, weights=weights)
+        self.means = np.bincount(group, weights=weights * means) / self.weights
+
+    def quantile(self, qs):
+        qs = np.asarray(qs, dtype=float)
+        if self.exact:
+            return np.percentile(self.means, qs * 100)
+        order = np.argsort(self.means, kind="stable")
+        means, weights = self.means[order], self.weights[order]
+        total = weights.sum()
+        mids = np.cumsum(weights) - weights / 2
+        return np.interp(qs * total, np.r_[0, mids, total], np.r_[self.min, means, self.max])
+
+
+class BoxSketch:
+    """
+    Статистики ящика с усами для потока значений: квартили — из t-digest,
+    усы и выбросы — по BOX_EXTREMES самым малым и самым большим значениям
+    (точно, пока выбросов с каждой стороны не больше BOX_EXTREMES). Если все
+    хранимые значения стороны — выбросы, часть выбросов потеряна: ус ставится
+    на ближайшее к ящику хранимое значение, подпись помечается, выдаётся предупреждение.
+    """
+
+    def __init__(self):
+        self.digest = TDigest()
+        self.total = 0.0
+        self.low = np.empty(0)
+        self.high = np.empty(0)
+
+    def update(self, values):
+        values = np.asarray(values, dtype=float)
+        values = values[~np.isnan(values)]
+        self.digest.update(values)
+        self._keep(values, values.sum())
+        return self
+
+    def merge(self, other):
+        self.digest.merge(other.digest)
+        self._keep(np.concatenate([other.low, other.high]), other.total, other.low, other.high)
+        return self
+
+    def _keep(self, values, total, low=None, high=None):
+        self.total += total
+        low = np.concatenate([self.low, values if low is None else low])
+        high = np.concatenate([self.high, values if high is None else high])
+        if len(low) > BOX_EXTREMES:
+            low = np.partition(low, BOX_EXTREMES - 1)[:BOX_EXTREMES]
+        if len(high) > BOX_EXTREMES:
+            high = np.partition(high, len(high) - BOX_EXTREMES)[-BOX_EXTREMES:]
+        self.low, self.high = low, high
+
+    def stats(self, label):
+        """Словарь для Axes.bxp — как matplotlib.cbook.boxplot_stats (при малом числе значений — он и есть)."""
+        if self.digest.exact:
+            return cbook.boxplot_stats(self.digest.means, labels=[label])[0]
+        n = self.digest.count
+        q1, med, q3 = self.digest.quantile([0.25, 0.5, 0.75])
+        iqr = q3 - q1
+        lo_fence, hi_fence = q1 - 1.5 * iqr, q3 + 1.5 * iqr
+        low, high = np.sort(self.low), np.sort(self.high)
+        # хранимых значений меньше, чем всего, и все они за забором — выбросы обрезаны
+        cut_low = n > len(low) and low[-1] < lo_fence
+        cut_high = n > len(high) and high[0] > hi_fence
+        if cut_low or cut_high:
+            warnings.warn(f"{label}: выбросов больше BOX_EXTREMES={BOX_EXTREMES}, "
+                          "показаны не все, ус — по крайнему хранимому значению.")
+            label = f"{label}\n(выбросы неполные)"
+        if cut_low:
+            whislo, low_fliers = low[-1], low[:-1]
+        else:
+            inside = low[low >= lo_fence]
+            whislo, low_fliers = (inside[0] if len(inside) else lo_fence), low[low < lo_fence]
+        if cut_high:
+            whishi, high_fliers = high[0], high[1:]
+        else:
+            inside = high[high <= hi_fence]
+            whishi, high_fliers = (inside[-1] if len(inside) else hi_fence), high[high > hi_fence]
+        return {
+            "label": label, "mean": self.total / n, "iqr": iqr, "q1": q1, "med": med, "q3": q3,
+            "cilo": med - 1.57 * iqr / np.sqrt(n), "cihi": med + 1.57 * iqr / np.sqrt(n),
+            "whislo": whislo, "whishi": whishi,
+            "fliers": np.concatenate([low_fliers, high_fliers]),
+        }
+
 
-group1 = df[df["VV"] < 5]["P"].dropna()
-group2 = df[(df["VV"] >= 5) & (df["VV"] <= 15)]["P"].dropna()
-group3 = df[df["VV"] > 15]["P"].dropna()
+VV_GROUPS = ["VV < 5", "5 ≤ VV ≤ 15", "VV > 15"]
+
+
+def _vv_masks(vv):
+    return [vv < 5, (vv >= 5) & (vv <= 15), vv > 15]
+
+
+def exact_box_stats(df):
+    """Ящики P по группам VV точно, по самим строкам (когда все строки в памяти)."""
+    return [cbook.boxplot_stats(df.loc[mask, "P"].dropna().to_numpy(), labels=[label])[0]
+            for mask, label in zip(_vv_masks(df["VV"]), VV_GROUPS)]
+
+
+def _add(a, b):
+    # add с fill_value переводит целые частоты во float при несовпадающих индексах — возвращаем тип
+    return b if a is None else a.add(b, fill_value=0).astype(np.result_type(a.dtype, b.dtype))
+
+
+class WeatherSummary:
+    """
+    Все сводки отчёта за один проход по кускам данных: суммы и количества T
+    по месяцам и по дням, частоты N, H и T, ящики P по группам видимости VV,
+    частоты пар (T, U, N = 100) для графиков плотности. Объём зависит от
+    числа различных значений и дней, а не от числа строк; сводки
+    складываются (merge), так что куски можно считать отдельно.
+    """
+
+    def __init__(self):
+        self.rows = 0
+        self.month_sum = np.zeros(13)
+        self.month_count = np.zeros(13, dtype=np.int64)
+        self.day_sum = self.day_count = None
+        self.n_counts = self.h_counts = self.t_counts = self.pairs = None
+        self.h_nan = 0
+        self.boxes = [BoxSketch() for _ in VV_GROUPS]
+
+    def update(self, chunk):
+        self.rows += len(chunk)
+        t = chunk["T"]
+        with_t = chunk[t.notna() & chunk["local_time_parsed"].notna()]
+        month = with_t["local_time_parsed"].dt.month.to_numpy(dtype=np.int64)
+        self.month_sum += np.bincount(month, weights=with_t["T"].to_numpy(), minlength=13)
+        self.month_count += np.bincount(month, minlength=13)
+        days = with_t.groupby(with_t["local_time_parsed"].dt.normalize())["T"]
+        self.day_sum, self.day_count = _add(self.day_sum, days.sum()), _add(self.day_count, days.count())
+
+        self.n_counts = _add(self.n_counts, chunk["N"].value_counts())
+        self.h_counts = _add(self.h_counts, chunk["H"].value_counts())
+        self.h_nan += int(chunk["H"].isna().sum())
+        self.t_counts = _add(self.t_counts, t.value_counts())
+
+        vv, p = chunk["VV"], chunk["P"]
+        for box, mask in zip(self.boxes, _vv_masks(vv)):
+            box.update(p[mask].to_numpy())
+
+        tu = chunk.dropna(subset=["T", "U"])
+        self.pairs = _add(self.pairs, tu.groupby([tu["T"], tu["U"], (tu["N"] == 100).rename("N100")]).size())
+        return self
+
+    def merge(self, other):
+        self.rows += other.rows
+        self.month_sum += other.month_sum
+        self.month_count += other.month_count
+        for name in ("day_sum", "day_count", "n_counts", "h_counts", "t_counts", "pairs"):
+            if getattr(other, name) is not None:
+                setattr(self, name, _add(getattr(self, name), getattr(other, name)))
+        self.h_nan += other.h_nan
+        for box, other_box in zip(self.boxes, other.boxes):
+            box.merge(other_box)
+        return self
+
+    # --- данные для графиков ---
+    def monthly_avg(self):
+        months = np.flatnonzero(self.month_count)
+        return pd.Series(self.month_sum[months] / self.month_count[months], index=pd.Index(months, name="month"),
+                         name="T")
+
+    def daily_avg(self):
+        avg = (self.day_sum / self.day_count).rename("T")
+        return avg.rename_axis("local_time_parsed").reset_index()
+
+    def counts_N(self):
+        return self.n_counts.astype(np.int64).sort_index()
+
+    def h_plot(self):
+        # как df["H"].fillna("NaN").astype(str).value_counts(): подписи — строковый вид чисел
+        h_counts = self.h_counts.astype(np.int64)
+        h_counts.index = h_counts.index.astype(str)
+        if self.h_nan:
+            h_counts["NaN"] = self.h_nan
+        h_counts = h_counts.sort_values(ascending=False, kind="stable")
+        # если слишком много категорий ‒ оставим топ-6
+        if len(h_counts) > 6:
+            h_plot = h_counts.iloc[:6].copy()
+            h_plot["other"] = h_counts.iloc[6:].sum()
+            return h_plot
+        return h_counts
+
+    def box_stats(self):
+        return [box.stats(label) for box, label in zip(self.boxes, VV_GROUPS)]
 
-plt.figure(figsize=(8, 6))
-plt.boxplot([group1, group2, group3],
-            labels=["VV < 5", "5 ≤ VV ≤ 15", "VV > 15"])
-plt.ylabel("Давление P (мм рт. ст.)")
-plt.title("Распределение давления по группам видимости")
-plt.tight_layout()
-plt.savefig(f"{OUT_DIR}/boxplots_P_by_visibility.png", dpi=150)
-plt.close()
 
 # -------------------------------------------
-# 11. Pie chart по основанию облаков (H)
+# Инкрементальная загрузка дописываемого архива
 # -------------------------------------------
-h_counts = df["H"].fillna("NaN").astype(str).value_counts()
-
-# если слишком много категорий ‒ оставим топ-6
-if len(h_counts) > 6:
-    h_plot = h_counts.iloc[:6].copy()
-    h_plot["other"] = h_counts.iloc[6:].sum()
-else:
-    h_plot = h_counts
-
-plt.figure(figsize=(7, 7))
-plt.pie(h_plot.values, labels=h_plot.index,
-        autopct="%1.1f%%", startangle=90)
-plt.title("Распределение высоты основания облаков H")
-plt.tight_layout()
-plt.savefig(f"{OUT_DIR}/pie_H.png", dpi=150)
-plt.close()
-
-print(OUT_DIR)
+def _fingerprint(path, offset, size=4096):
+    """Хэш начала файла и байтов перед offset: если они изменились, файл переписан, а не дописан."""
+    with open(path, "rb") as f:
+        head = f.read(min(size, offset))
+        f.seek(max(offset - size, 0))
+        tail = f.read(min(size, offset))
+    return hashlib.sha256(head + b"|" + tail).hexdigest()
+
+
+def _load_state(state_path, path):
+    """Сохранённое состояние, если CSV с тех пор только дописывался; иначе None."""
+    try:
+        with open(state_path, "rb") as f:
+            state = pickle.load(f)
+        if os.path.getsize(path) >= state["offset"] and _fingerprint(path, state["offset"]) == state["fingerprint"]:
+            return state
+    except (OSError, EOFError, KeyError, TypeError, AttributeError, ImportError, pickle.UnpicklingError):
+        pass
+    return None
+
+
+def _iter_new_rows(path, start, end, block_bytes):
+    """
+    Типизированные строки из байтов [start, end) файла — блоками по целым
+    строкам, вместе с исходными строками файла (по одной на строку фрейма).
+    """
+    time_col, options = _read_options(path)
+    names = _read_header(path)
+    with open(path, "rb") as f:
+        f.seek(start)
+        while f.tell() < end:
+            block = f.read(min(block_bytes, end - f.tell()))
+            if not block.endswith(b"\n") and f.tell() < end:
+                block += f.readline()
+            rows = _typed(pd.read_csv(io.BytesIO(block), header=None, names=names, **options), time_col)
+            lines = [line for line in block.replace(b"\r", b"").split(b"\n") if line.strip()]
+            if len(lines) != len(rows):
+                raise ValueError(f"{path}: строки в байтах [{start}, {end}) не разбираются по одной на строку файла")
+            yield rows, lines
+
+
+def _line_key(line):
+    return hashlib.blake2b(line, digest_size=16).digest()
+
+
+def _last_line_end(path, start, window=65536):
+    """Позиция после последнего перевода строки в файле (не раньше start): недописанная строка не берётся."""
+    with open(path, "rb") as f:
+        end = f.seek(0, os.SEEK_END)
+        while end > start:
+            pos = max(end - window, start)
+            f.seek(pos)
+            newline = f.read(end - pos).rfind(b"\n")
+            if newline >= 0:
+                return pos + newline + 1
+            end = pos
+    return start
+
+
+def ingest(path=CSV_PATH, state_path=INGEST_STATE, block_bytes=INGEST_BLOCK_BYTES):
+    """
+    Дописывает в сохранённые сводки только новые строки CSV.
+
+    Состояние: WeatherSummary, смещение в байтах после последней целой
+    разобранной строки, последний local_time, хэши строк файла с этим
+    временем и отпечаток файла. Разбирается хвост [смещение, последний
+    перевод строки) — недописанная строка ждёт следующего запуска. Строки
+    старше последнего local_time (повторная выгрузка того же интервала)
+    пропускаются; строки ровно с последним временем пропускаются, только
+    если такая же строка уже была учтена (у нескольких станций время
+    совпадает, поэтому одинаковое время — ещё не повтор). Если файл
+    переписан, а не дописан, сводки строятся заново. Возвращает (сводки,
+    число новых строк).
+    """
+    state = _load_state(state_path, path)
+    if state is None:
+        with open(path, "rb") as f:
+            header_end = len(f.readline())
+        state = {"summary": WeatherSummary(), "offset": header_end, "last_time": None, "last_rows": Counter()}
+
+    end = _last_line_end(path, state["offset"])
+    added = 0
+    if end > state["offset"]:
+        # первый проход берёт файл целиком, в любом порядке строк
+        last_time = state["last_time"]
+        seen = Counter(state["last_rows"])   # сколько раз каждая строка с last_time уже учтена
+        newest, newest_rows = last_time, Counter(state["last_rows"])
+        for rows, lines in _iter_new_rows(path, state["offset"], end, block_bytes):
+            t = rows["local_time_parsed"].to_numpy()
+            keep = np.ones(len(rows), dtype=bool)
+            if last_time is not None:
+                keep &= ~(t < last_time)
+                for pos in np.flatnonzero(t == last_time):
+                    key = _line_key(lines[pos])
+                    if seen[key] > 0:
+                        seen[key] -= 1
+                        keep[pos] = False
+            state["summary"].update(rows[keep])
+            added += int(keep.sum())
+
+            kept_t = t[keep]
+            kept_t = kept_t[~np.isnat(kept_t)]
+            if len(kept_t):
+                block_max = kept_t.max()
+                if newest is None or block_max > newest:
+                    newest, newest_rows = block_max, Counter()
+                if block_max == newest:
+                    newest_rows.update(_line_key(lines[pos]) for pos in np.flatnonzero(keep & (t == newest)))
+        state["last_time"], state["last_rows"] = newest, newest_rows
+        state["offset"] = end
+
+    state["fingerprint"] = _fingerprint(path, state["offset"])
+    tmp = state_path + ".tmp"
+    with open(tmp, "wb") as f:
+        pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, state_path)
+    return state["summary"], added
+
+
+def _density(t, u, weights, t_edges, u_edges):
+    counts, _, _ = np.histogram2d(t, u, bins=(t_edges, u_edges), weights=weights)
+    return counts
+
+
+def _edges(values, bins):
+    """
+    Границы не более bins ячеек. Показания записаны с шагом (U — целые, T —
+    десятые), поэтому ширина ячейки кратна шагу, а границы лежат между
+    возможными значениями — иначе часть ячеек получает на одно значение
+    больше и на картинке появляются полосы.
+    """
+    uniq = np.unique(values)
+    if len(uniq) < 2:
+        center = uniq[0] if len(uniq) else 0.0
+        return np.array([center - 0.5, center + 0.5])
+    step = np.diff(uniq).min()
+    width = np.ceil((uniq[-1] - uniq[0] + step) / bins / step) * step
+    count = int(np.ceil((uniq[-1] - uniq[0] + step) / width))
+    return uniq[0] - step / 2 + width * np.arange(count + 1)
+
+
+def density_data(pairs, bins=DENSITY_BINS):
+    """
+    Счётчики 2-D гистограммы T/U (отдельно N = 100 и остальные) на общей сетке
+    по частотам пар (T, U, N = 100) — из WeatherSummary.pairs или pair_counts(df).
+    """
+    t = pairs.index.get_level_values(0).to_numpy(dtype=float)
+    u = pairs.index.get_level_values(1).to_numpy(dtype=float)
+    mask100 = pairs.index.get_level_values(2).to_numpy(dtype=bool)
+    weights = pairs.to_numpy(dtype=float)
+    t_edges, u_edges = _edges(t, bins), _edges(u, bins)
+    counts100 = _density(t[mask100], u[mask100], weights[mask100], t_edges, u_edges)
+    counts_other = _density(t[~mask100], u[~mask100], weights[~mask100], t_edges, u_edges)
+    return counts100, counts_other, t_edges, u_edges
+
+
+def lttb(x, y, n_out):
+    """
+    Largest-Triangle-Three-Buckets: индексы n_out точек ряда (x по возрастанию),
+    сохраняющих его форму. Первая и последняя точки остаются; из каждой
+    корзины берётся точка, образующая наибольший треугольник с уже выбранной
+    точкой слева и средним следующей корзины.
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    idx = np.empty(n_out, dtype=np.int64)
+    idx[0], idx[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        if i + 2 < len(edges):
+            next_x, next_y = x[hi:edges[i + 2]].mean(), y[hi:edges[i + 2]].mean()
+        else:
+            next_x, next_y = x[-1], y[-1]
+        area = np.abs((x[a] - next_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (next_y - y[a]))
+        a = lo + int(np.argmax(area))
+        idx[i + 1] = a
+    return idx
+
+
+def _line(df_time, points=LINE_POINTS):
+    """LTTB-выборка ряда температуры (df_time отсортирован по времени)."""
+    time_ns = df_time["local_time_parsed"].to_numpy(dtype="datetime64[ns]").astype(np.int64)
+    return df_time[["local_time_parsed", "T"]].iloc[lttb(time_ns, df_time["T"].to_numpy(), points)]
+
+
+def summary_tasks(summary, box_stats=None):
+    """
+    Графики, которые строятся только по сводкам: п. 7–11. box_stats —
+    точные ящики, если строки есть в памяти; иначе — из t-digest сводок.
+    """
+    return [
+        ("bar_monthly_avg_T.png", draw_monthly, summary.monthly_avg()),
+        ("hbar_cloudiness_counts.png", draw_cloudiness, summary.counts_N()),
+        ("hist_T_10bins.png", draw_hist, summary.t_counts.astype(np.int64).sort_index()),
+        ("boxplots_P_by_visibility.png", draw_boxplots, summary.box_stats() if box_stats is None else box_stats),
+        ("pie_H.png", draw_pie, summary.h_plot()),
+    ]
+
+
+def chart_tasks(df):
+    """
+    Задачи отрисовки: (имя файла, функция, срез данных). Срез — ровно то,
+    что функция рисует, так что изменение других столбцов или строк, не
+    попадающих в график, его не перерисовывает.
+
+    В агрегированном режиме диаграммы рассеяния получают счётчики 2-D
+    гистограммы, а график температуры — LTTB-выборку из LINE_POINTS точек:
+    время отрисовки зависит от размера картинки, а не от числа строк.
+    """
+    aggregate = RENDER_MODE == "aggregate" or (RENDER_MODE == "auto" and len(df) > AGGREGATE_ROWS)
+    summary = WeatherSummary().update(df)
+
+    df_time = df.dropna(subset=["local_time_parsed", "T"]).sort_values("local_time_parsed")
+
+    if aggregate:
+        counts100, counts_other, t_edges, u_edges = density_data(summary.pairs)
+        line = _line(df_time)
+        scatter_tasks = [
+            ("scatter_T_U.png", draw_density, [counts100 + counts_other, t_edges, u_edges]),
+            ("scatter_T_U_colored.png", draw_density_colored, [counts100, counts_other, t_edges, u_edges]),
+        ]
+    else:
+        line = df_time[["local_time_parsed", "T"]]
+        scatter_tasks = [
+            ("scatter_T_U.png", draw_scatter, df[["T", "U"]]),
+            ("scatter_T_U_colored.png", draw_scatter_colored, df[["T", "U", "N"]]),
+        ]
+
+    return scatter_tasks + [("line_temperature.png", draw_line, line)] + summary_tasks(summary, exact_box_stats(df))
+
+
+def archive_tasks(summary):
+    """
+    Все графики только по сводкам (потоковый режим): рассеяние — плотность
+    по частотам пар, температура — LTTB по среднесуточным значениям.
+    """
+    counts100, counts_other, t_edges, u_edges = density_data(summary.pairs)
+    return [
+        ("scatter_T_U.png", draw_density, [counts100 + counts_other, t_edges, u_edges]),
+        ("scatter_T_U_colored.png", draw_density_colored, [counts100, counts_other, t_edges, u_edges]),
+        ("line_temperature.png", draw_line, _line(summary.daily_avg())),
+    ] + summary_tasks(summary)
+
+
+def _hash_part(h, part):
+    if isinstance(part, (list, tuple)):
+        for item in part:
+            _hash_part(h, item)
+    elif isinstance(part, dict):
+        for key in sorted(part):
+            h.update(repr(key).encode("utf-8"))
+            _hash_part(h, part[key])
+    elif isinstance(part, np.ndarray):
+        h.update(repr((part.shape, str(part.dtype))).encode("utf-8"))
+        h.update(np.ascontiguousarray(part).tobytes())
+    elif isinstance(part, (pd.Series, pd.DataFrame)):
+        h.update(repr((getattr(part, "name", None), list(getattr(part, "columns", [])), str(part.dtypes))).encode("utf-8"))
+        h.update(pd.util.hash_pandas_object(part, index=True).to_numpy().tobytes())
+    else:
+        h.update(repr(part).encode("utf-8"))
+
+
+def task_hash(draw, data):
+    """Хэш среза данных, кода функции рисования и параметров сохранения."""
+    h = hashlib.sha256()
+    h.update(inspect.getsource(draw).encode("utf-8"))
+    h.update(f"dpi={DPI};matplotlib={matplotlib.__version__}".encode("utf-8"))
+    _hash_part(h, data)
+    return h.hexdigest()
+
+
+def stored_hash(path):
+    """Хэш, записанный в PNG при прошлой отрисовке (None — файла нет или он нарисован не нами)."""
+    try:
+        with Image.open(path) as img:
+            return img.text.get(HASH_KEY)
+    except (OSError, ValueError):
+        return None
+
+
+def render(task):
+    path, draw, data, digest = task
+    draw(data)
+    plt.tight_layout()
+    plt.savefig(path, dpi=DPI, metadata={HASH_KEY: digest})
+    plt.close()
+    return path
+
+
+def render_all(tasks, out_dir=OUT_DIR, workers=RENDER_WORKERS):
+    """Рисует только графики, у которых хэш не совпал с записанным в PNG; возвращает их пути."""
+    todo = []
+    for name, draw, data in tasks:
+        path = os.path.join(out_dir, name)
+        digest = task_hash(draw, data)
+        if stored_hash(path) != digest:
+            todo.append((path, draw, data, digest))
+    if workers > 1 and len(todo) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(todo))) as pool:
+            return list(pool.map(render, todo))
+    return [render(task) for task in todo]
+
+
+def main():
+    os.makedirs(OUT_DIR, exist_ok=True)
+    if INCREMENTAL:
+        summary, added = ingest(CSV_PATH, INGEST_STATE)
+        print(f"Новых строк: {added}")
+        tasks = archive_tasks(summary)
+    elif CHUNK_ROWS:
+        summary = WeatherSummary()
+        for chunk in iter_weather(CSV_PATH, CHUNK_ROWS):
+            summary.update(chunk)
+        tasks = archive_tasks(summary)
+    else:
+        df = load_weather(CSV_PATH, TYPED_CACHE)
+        tasks = chart_tasks(df)
+    drawn = render_all(tasks, OUT_DIR, RENDER_WORKERS)
+    print(f"Перерисовано графиков: {len(drawn)} из {len(tasks)}")
+    print(OUT_DIR)
+
+
+if __name__ == "__main__":
+    main()
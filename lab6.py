@@ -1,13 +1,18 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
+import io
 import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import nullcontext
+from functools import reduce
+
 import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
 
-from sklearn.model_selection import train_test_split
-from sklearn.linear_model import LinearRegression, Ridge
+from sklearn.model_selection import train_test_split, ShuffleSplit
+from sklearn.linear_model import LinearRegression
 from sklearn.preprocessing import PolynomialFeatures, StandardScaler
 from sklearn.pipeline import Pipeline
 from sklearn.metrics import r2_score, mean_squared_error
@@ -18,174 +23,699 @@ from sklearn.metrics import r2_score, mean_squared_error
 
 CSV_PATH = "boston.csv"
 OUT_DIR = "lab06_results"
-os.makedirs(OUT_DIR, exist_ok=True)
 RANDOM_STATE = 42
 TARGET = "MEDV"
+TOP_N = 5
+TEST_SIZE = 0.2
+RIDGE_ALPHA = 1.0
+RIDGE_ALPHAS = np.logspace(-3, 5, 200)   # путь Ridge: все alpha считаются из одного разложения
+LOO_BLOCK_ROWS = 50_000                 # LOO считается блоками строк (память — блок x число alpha)
+CHUNK_BYTES = None      # например 64 * 2**20 — CSV читается кусками, строки в памяти не хранятся
+STATS_WORKERS = 1       # > 1 — куски сворачиваются в статистики в пуле процессов
+MEDIAN_EXACT_VALUES = 100_000   # потоковые медианы: столько значений ячейки уже собираются целиком
 
-# ---------------------------------------------------------
-# 1. Загрузка данных
-# ---------------------------------------------------------
-
-df = pd.read_csv(CSV_PATH)
-print("\nИсходные данные:", df.shape)
-print(df.head())
 
 # ---------------------------------------------------------
-# 2. Приведение типов и заполнение пропусков
+# Достаточные статистики
 # ---------------------------------------------------------
 
-for col in df.columns:
-    df[col] = pd.to_numeric(df[col], errors="coerce")
-
-missing_before = df.isnull().sum()
-print("\nПропуски до заполнения:\n", missing_before[missing_before > 0])
+class SuffStats:
+    """
+    Всё, что нужно для корреляций и МНК, за один проход: число строк, средние
+    и матрица со-моментов sum((z - mean)(z - mean)^T). Вектор z строки —
+    значения столбцов (пропуск -> 0) и индикаторы пропусков, поэтому
+    статистики данных после fillna(константы) получаются из них точно
+    (moments). Статистики кусков складываются (merge, формулы Chan et al.),
+    так что куски можно считать отдельно и в разных процессах. Объём — O(p^2)
+    при любом числе строк; медианы для fillna считаются отдельно.
+    """
+
+    def __init__(self, columns):
+        self.columns = list(columns)
+        p = len(self.columns)
+        self.n = 0
+        self.mean = np.zeros(2 * p)
+        self.comoment = np.zeros((2 * p, 2 * p))
+
+    def update(self, df):
+        x = df[self.columns].to_numpy(dtype=float)
+        if not len(x):
+            return self
+        miss = np.isnan(x)
+        z = np.hstack([np.where(miss, 0.0, x), miss])
+        part = SuffStats(self.columns)
+        part.n = len(z)
+        part.mean = z.mean(axis=0)
+        d = z - part.mean
+        part.comoment = d.T @ d
+        return self.merge(part)
+
+    def merge(self, other):
+        if other.n:
+            n = self.n + other.n
+            delta = other.mean - self.mean
+            self.mean = self.mean + delta * (other.n / n)
+            self.comoment = self.comoment + other.comoment + np.outer(delta, delta) * (self.n * other.n / n)
+            self.n = n
+        return self
+
+    def missing(self):
+        """Число пропусков по столбцам — из средних индикаторов."""
+        p = len(self.columns)
+        return pd.Series(np.rint(self.mean[p:] * self.n).astype(np.int64), index=self.columns)
+
+    def moments(self, fill):
+        """(n, средние, со-моменты) столбцов после fillna(fill) — как у df.fillna(fill)."""
+        p = len(self.columns)
+        fill = np.where(self.missing().to_numpy() > 0, np.asarray(fill, dtype=float), 0.0)
+        a = np.hstack([np.eye(p), np.diag(fill)])
+        mean = pd.Series(a @ self.mean, index=self.columns)
+        comoment = pd.DataFrame(a @ self.comoment @ a.T, index=self.columns, columns=self.columns)
+        return self.n, mean, comoment
+
+
+def combined(*stats):
+    total = SuffStats(stats[0].columns)
+    return reduce(SuffStats.merge, stats, total)
+
+
+def corr_from(moments):
+    """df.corr() по со-моментам."""
+    _, _, comoment = moments
+    sd = np.sqrt(np.diag(comoment.to_numpy()))
+    corr = np.clip(comoment.to_numpy() / np.outer(sd, sd), -1, 1)
+    np.fill_diagonal(corr, 1.0)
+    return pd.DataFrame(corr, index=comoment.index, columns=comoment.columns)
+
+
+def fit_from(moments, features, target, alpha=0.0):
+    """
+    Линейная регрессия со свободным членом по со-моментам: alpha = 0 —
+    LinearRegression, alpha > 0 — Ridge(alpha) (штраф без свободного члена,
+    как в sklearn). Возвращает (intercept, coef).
+    """
+    _, mean, comoment = moments
+    cxx = comoment.loc[features, features].to_numpy()
+    cxy = comoment.loc[features, target].to_numpy()
+    coef = np.linalg.solve(cxx + alpha * np.eye(len(features)), cxy)
+    return mean[target] - mean[features].to_numpy() @ coef, pd.Series(coef, index=features)
+
+
+def scores_from(moments, features, target, model):
+    """(R2, RMSE) модели на строках, по которым собраны moments, — без самих строк."""
+    n, mean, comoment = moments
+    intercept, coef = model
+    b = coef.to_numpy()
+    cxx = comoment.loc[features, features].to_numpy()
+    cxy = comoment.loc[features, target].to_numpy()
+    syy = comoment.loc[target, target]
+    resid_mean = mean[target] - intercept - mean[features].to_numpy() @ b
+    sse = max(syy - 2 * b @ cxy + b @ cxx @ b, 0.0) + n * resid_mean ** 2
+    return 1 - sse / syy, np.sqrt(sse / n)
+
+
+def ridge_path(train, features, target, alphas, test=None):
+    """
+    Ridge для всех alphas сразу по одному собственному разложению
+    со-моментов признаков обучающей выборки (Cxx = V diag(s) V^T — то же,
+    что SVD центрированной матрицы X, s = сингулярные числа в квадрате):
+    coef(alpha) = V diag(1 / (s + alpha)) V^T Cxy — столбцы матрицы p x len(alphas).
+    По моментам же считаются R2/RMSE на train (и на test, если он задан) и
+    GCV = (SSE / n) / (1 - tr(H) / n)^2, где tr(H) = 1 + sum(s / (s + alpha)).
+    Возвращает DataFrame с индексом alpha.
+    """
+    n, mean, comoment = train
+    cxx = comoment.loc[features, features].to_numpy()
+    cxy = comoment.loc[features, target].to_numpy()
+    syy = comoment.loc[target, target]
+    alphas = np.asarray(alphas, dtype=float)
+
+    s, v = np.linalg.eigh(cxx)
+    s = np.clip(s, 0, None)
+    c = v.T @ cxy
+    shrink = 1 / (s[:, None] + alphas)
+    coefs = v @ (c[:, None] * shrink)
+    intercepts = mean[target] - mean[features].to_numpy() @ coefs
+
+    sse = np.clip(syy - (c ** 2) @ (2 * shrink - s[:, None] * shrink ** 2), 0, None)
+    trace = 1 + s @ shrink
+    path = pd.DataFrame(coefs.T, index=pd.Index(alphas, name="alpha"), columns=features)
+    path.insert(0, "intercept", intercepts)
+    path["train_r2"] = 1 - sse / syy
+    path["train_rmse"] = np.sqrt(sse / n)
+    path["gcv"] = sse / n / (1 - trace / n) ** 2
+
+    if test is not None:
+        n_t, mean_t, comoment_t = test
+        cxx_t = comoment_t.loc[features, features].to_numpy()
+        cxy_t = comoment_t.loc[features, target].to_numpy()
+        syy_t = comoment_t.loc[target, target]
+        resid_mean = mean_t[target] - intercepts - mean_t[features].to_numpy() @ coefs
+        sse_t = syy_t - 2 * cxy_t @ coefs + np.einsum("ia,ij,ja->a", coefs, cxx_t, coefs)
+        sse_t = np.clip(sse_t, 0, None) + n_t * resid_mean ** 2
+        path["test_r2"] = 1 - sse_t / syy_t
+        path["test_rmse"] = np.sqrt(sse_t / n_t)
+    return path
+
+
+def ridge_loo(X, y, alphas, block_rows=LOO_BLOCK_ROWS):
+    """
+    Точная ошибка leave-one-out (средний квадрат) Ridge со свободным членом
+    для всех alphas по одному SVD центрированной X: остаток без i-й строки
+    равен e_i / (1 - h_ii), h_ii = 1/n + sum_k U_ik^2 s_k^2 / (s_k^2 + alpha).
+    Строки обходятся блоками, так что память — block_rows x len(alphas).
+    """
+    x = np.asarray(X, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+    alphas = np.asarray(alphas, dtype=float)
+    u, s, _ = np.linalg.svd(x - x.mean(axis=0), full_matrices=False)
+    yc = y - y.mean()
+    f = s[:, None] ** 2 / (s[:, None] ** 2 + alphas)
+    fy = f * (u.T @ yc)[:, None]
+    total = np.zeros(len(alphas))
+    for start in range(0, n, block_rows):
+        ub = u[start:start + block_rows]
+        resid = yc[start:start + block_rows, None] - ub @ fy
+        h = 1 / n + (ub ** 2) @ f
+        total += ((resid / (1 - h)) ** 2).sum(axis=0)
+    return pd.Series(total / n, index=pd.Index(alphas, name="alpha"), name="loo")
+
+
+def print_ridge_path(path):
+    print(f"\n=== Ridge: путь по {len(path)} значениям alpha ===")
+    for column in ("gcv", "loo", "test_rmse"):
+        if column in path:
+            best = path[column].idxmin()
+            row = path.loc[best]
+            line = f"Лучшее alpha по {column}: {best:.4g} (train R2 {row['train_r2']:.4f}"
+            if "test_r2" in path:
+                line += f", test R2 {row['test_r2']:.4f}, test RMSE {row['test_rmse']:.4f}"
+            print(line + ")")
+
+
+def draw_ridge_path(path, features):
+    fig, (ax_coef, ax_err) = plt.subplots(1, 2, figsize=(12, 4))
+    for feat in features:
+        ax_coef.plot(path.index, path[feat], label=feat)
+    ax_coef.set_xscale("log")
+    ax_coef.set_xlabel("alpha")
+    ax_coef.set_title("Ridge coefficients")
+    ax_coef.legend()
+    for column, label in (("train_rmse", "train RMSE"), ("test_rmse", "test RMSE"),
+                          ("gcv", "sqrt(GCV)"), ("loo", "sqrt(LOO)")):
+        if column in path:
+            values = path[column] if column.endswith("rmse") else np.sqrt(path[column])
+            ax_err.plot(path.index, values, label=label)
+    ax_err.set_xscale("log")
+    ax_err.set_xlabel("alpha")
+    ax_err.set_title("Ridge errors")
+    ax_err.legend()
+    fig.tight_layout()
+    fig.savefig(os.path.join(OUT_DIR, "ridge_path.png"), dpi=150)
+    plt.close(fig)
+
+
+class LinearFit:
+    """
+    Линейная регрессия (как fit_from), которую можно дообучать и «разобучать»
+    по строкам. Хранит n, средние и со-моменты столбцов features + target;
+    add/remove сливают или вычитают статистики изменённых строк (та же формула
+    Chan et al., для удаления — с отрицательным числом строк). Пересчёт стоит
+    столько, сколько строк изменилось, а не вся выборка.
+    """
+
+    def __init__(self, features, target, alpha=0.0):
+        self.features, self.target, self.alpha = list(features), target, alpha
+        self.columns = self.features + [target]
+        self.n = 0
+        self.mean = np.zeros(len(self.columns))
+        self.comoment = np.zeros((len(self.columns), len(self.columns)))
+
+    @classmethod
+    def from_moments(cls, moments, features, target, alpha=0.0):
+        fit = cls(features, target, alpha)
+        n, mean, comoment = moments
+        fit.n = n
+        fit.mean = mean[fit.columns].to_numpy()
+        fit.comoment = comoment.loc[fit.columns, fit.columns].to_numpy()
+        return fit
+
+    def _apply(self, X, y, sign):
+        z = np.column_stack([np.asarray(X, dtype=float), np.asarray(y, dtype=float)])
+        if not len(z):
+            return self
+        n_part = sign * len(z)
+        n = self.n + n_part
+        if n < 0:
+            raise ValueError(f"удаляется {len(z)} строк, а в модели их {self.n}")
+        if n == 0:
+            self.__init__(self.features, self.target, self.alpha)
+            return self
+        mean_part = z.mean(axis=0)
+        d = z - mean_part
+        delta = mean_part - self.mean
+        self.mean = self.mean + delta * (n_part / n)
+        self.comoment = self.comoment + sign * (d.T @ d) + np.outer(delta, delta) * (self.n * n_part / n)
+        self.n = n
+        return self
+
+    def add(self, X, y):
+        return self._apply(X, y, 1)
+
+    def remove(self, X, y):
+        return self._apply(X, y, -1)
+
+    def moments(self):
+        return (self.n, pd.Series(self.mean, index=self.columns),
+                pd.DataFrame(self.comoment, index=self.columns, columns=self.columns))
+
+    def model(self):
+        return fit_from(self.moments(), self.features, self.target, self.alpha)
+
+    def predict(self, X):
+        intercept, coef = self.model()
+        return intercept + np.asarray(X, dtype=float) @ coef.to_numpy()
 
-df = df.fillna(df.median())
-
-missing_after = df.isnull().sum()
-print("\nПропуски после заполнения:\n", missing_after[missing_after > 0])
-
-# ---------------------------------------------------------
-# 3. Корреляция и heatmap
-# ---------------------------------------------------------
 
-corr = df.corr()
-
-plt.figure(figsize=(10, 8))
-plt.imshow(corr, cmap="coolwarm", aspect="auto")
-plt.colorbar()
-plt.xticks(range(len(corr.columns)), corr.columns, rotation=90)
-plt.yticks(range(len(corr.columns)), corr.columns)
-plt.title("Correlation heatmap")
-plt.tight_layout()
-plt.savefig(os.path.join(OUT_DIR, "heatmap.png"), dpi=150)
-plt.close()
-
-# ---------------------------------------------------------
-# 4. Выбор 4–6 признаков с наибольшей корреляцией
-# ---------------------------------------------------------
+def rmse(y_true, y_pred):
+    return np.sqrt(mean_squared_error(y_true, y_pred))
 
-corr_with_target = corr[TARGET].abs().sort_values(ascending=False)
-top_features = corr_with_target.drop(TARGET).head(5).index.tolist()
 
-print("\nТоп признаков:", top_features)
+def print_scores(title, train, test):
+    print(f"\n=== {title} ===")
+    print("Train R2:", train[0])
+    print("Test R2:", test[0])
+    print("Train RMSE:", train[1])
+    print("Test RMSE:", test[1])
 
-# ---------------------------------------------------------
-# 5. Scatter-plots для выбранных признаков
-# ---------------------------------------------------------
 
-for feat in top_features:
-    plt.figure(figsize=(6, 4))
-    plt.scatter(df[feat], df[TARGET], alpha=0.6)
-    plt.xlabel(feat)
-    plt.ylabel(TARGET)
-    plt.title(f"{feat} vs {TARGET}")
+def draw_heatmap(corr):
+    plt.figure(figsize=(10, 8))
+    plt.imshow(corr, cmap="coolwarm", aspect="auto")
+    plt.colorbar()
+    plt.xticks(range(len(corr.columns)), corr.columns, rotation=90)
+    plt.yticks(range(len(corr.columns)), corr.columns)
+    plt.title("Correlation heatmap")
     plt.tight_layout()
-    plt.savefig(os.path.join(OUT_DIR, f"scatter_{feat}.png"), dpi=150)
+    plt.savefig(os.path.join(OUT_DIR, "heatmap.png"), dpi=150)
     plt.close()
 
-# ---------------------------------------------------------
-# 6. Формирование выборок
-# ---------------------------------------------------------
 
-X = df[top_features]
-y = df[TARGET]
+def top_from(corr):
+    corr_with_target = corr[TARGET].abs().sort_values(ascending=False)
+    return corr_with_target.drop(TARGET).head(TOP_N).index.tolist()
 
-X_train, X_test, y_train, y_test = train_test_split(
-    X, y, test_size=0.2, shuffle=True, random_state=RANDOM_STATE
-)
 
 # ---------------------------------------------------------
-# 7. Linear Regression
+# Потоковый режим: CSV кусками, без хранения строк
 # ---------------------------------------------------------
 
-lr = LinearRegression()
-lr.fit(X_train, y_train)
+def _numeric(df):
+    for col in df.columns:
+        df[col] = pd.to_numeric(df[col], errors="coerce")
+    return df
+
+
+def split_mask(n):
+    """Маска тестовых строк — те же строки, что выбрал бы train_test_split для n строк."""
+    _, test = next(ShuffleSplit(n_splits=1, test_size=TEST_SIZE, random_state=RANDOM_STATE).split(np.zeros((n, 1))))
+    mask = np.zeros(n, dtype=bool)
+    mask[test] = True
+    return mask
+
+
+_KEY_BITS = 16
+_TOP = np.uint64(1 << 63)
+
+
+def _sort_keys(values):
+    """float64 -> uint64 с тем же порядком (знаковый бит и инверсия для отрицательных)."""
+    bits = np.ascontiguousarray(values, dtype=float).view(np.uint64)
+    return np.where(bits & _TOP, ~bits, bits | _TOP)
+
+
+def _from_key(key):
+    key = np.uint64(key)
+    bits = key ^ _TOP if key & _TOP else ~key
+    return float(np.array([bits], dtype=np.uint64).view(float)[0])
+
+
+class _MedianSearch:
+    """
+    Точные медианы столбцов по потоку кусков в ограниченной памяти.
+    Значения переводятся в 64-битные ключи того же порядка; каждый проход
+    уточняет по 16 бит ключа для нужных рангов ((m-1)//2 и m//2 среди
+    непропущенных): гистограмма 2^16 ячеек по значениям с уже известным
+    префиксом. Когда в ячейке ранга остаётся не больше MEDIAN_EXACT_VALUES
+    значений, следующий проход просто собирает их. Память — гистограммы
+    и не более MEDIAN_EXACT_VALUES значений на ранг, сколько бы ни было строк.
+    """
+
+    def __init__(self, columns, hists):
+        self.columns = list(columns)
+        # цель: [столбец, ранг внутри ячейки, уровень (бит префикса / 16), префикс, значений в ячейке, значение]
+        self.targets = []
+        self.counts = [int(h.sum()) for h in hists]
+        for j, hist in enumerate(hists):
+            m = self.counts[j]
+            for rank in sorted({(m - 1) // 2, m // 2}) if m else []:
+                target = [j, rank, 0, 0, m, None]
+                self._descend(target, hist)
+                self.targets.append(target)
+
+    def _descend(self, target, hist):
+        cum = np.cumsum(hist)
+        cell = int(np.searchsorted(cum, target[1], side="right"))
+        target[1] -= int(cum[cell - 1]) if cell else 0
+        target[2] += 1
+        target[3] = (target[3] << _KEY_BITS) | cell
+        target[4] = int(hist[cell])
+        if target[2] * _KEY_BITS == 64:        # известны все биты ключа
+            target[5] = _from_key(target[3])
+
+    def queries(self):
+        """Запросы следующего прохода: (столбец, уровень, префикс, собрать ли значения)."""
+        return sorted({(t[0], t[2], t[3], t[4] <= MEDIAN_EXACT_VALUES)
+                       for t in self.targets if t[5] is None})
+
+    def resolve(self, answers):
+        for t in self.targets:
+            if t[5] is not None:
+                continue
+            answer = answers[(t[0], t[2], t[3], t[4] <= MEDIAN_EXACT_VALUES)]
+            if t[4] <= MEDIAN_EXACT_VALUES:
+                t[5] = float(np.sort(answer)[t[1]])
+            else:
+                self._descend(t, answer)
+
+    def medians(self):
+        result = []
+        for j in range(len(self.columns)):
+            values = [t[5] for t in self.targets if t[0] == j]
+            if len(values) == 1:
+                values = values * 2
+            result.append((values[0] + values[1]) / 2 if values else np.nan)
+        return pd.Series(result, index=self.columns)
+
+
+def _answer_queries(df, queries):
+    """Ответы куска на запросы _MedianSearch: гистограммы следующих 16 бит или сами значения ячейки."""
+    answers = {}
+    for query in queries:
+        j, level, prefix, collect = query
+        values = df.iloc[:, j].to_numpy(dtype=float)
+        values = values[~np.isnan(values)]
+        keys = _sort_keys(values)
+        shift = np.uint64(64 - _KEY_BITS * level)
+        sel = (keys >> shift) == np.uint64(prefix) if level else np.ones(len(keys), dtype=bool)
+        if collect:
+            answers[query] = values[sel]
+        else:
+            low = shift - np.uint64(_KEY_BITS)
+            cells = ((keys[sel] >> low) & np.uint64((1 << _KEY_BITS) - 1)).astype(np.int64)
+            answers[query] = np.bincount(cells, minlength=1 << _KEY_BITS)
+    return answers
+
+
+def _chunk_ranges(path, chunk_bytes):
+    """Заголовок CSV и границы кусков [start, end) в байтах после него."""
+    with open(path, "rb") as f:
+        header = f.readline()
+    size = os.path.getsize(path)
+    starts = range(len(header), size, chunk_bytes)
+    return pd.read_csv(io.BytesIO(header)).columns.tolist(), [(s, min(s + chunk_bytes, size)) for s in starts]
+
+
+def _read_range(path, names, start, end):
+    """Строки, начинающиеся в байтах [start, end): обрезанная первая строка — у предыдущего куска."""
+    with open(path, "rb") as f:
+        f.seek(start - 1)
+        if f.read(1) != b"\n":
+            f.readline()
+        data = f.read(max(end - f.tell(), 0))
+        if data and not data.endswith(b"\n"):
+            data += f.readline()
+    if not data.strip():
+        return pd.DataFrame({name: pd.Series(dtype=float) for name in names})
+    return _numeric(pd.read_csv(io.BytesIO(data), header=None, names=names))
+
+
+def _scan_range(task):
+    """
+    Один кусок: число строк, ответы на запросы медиан и — если задана маска
+    test (второй проход, номера строк уже известны) — статистики (train, test).
+    """
+    path, names, start, end, test, queries = task
+    df = _read_range(path, names, start, end)
+    out = {"rows": len(df), "answers": _answer_queries(df, queries)}
+    if test is not None:
+        if len(df) != len(test):
+            raise ValueError(f"{path}: в байтах [{start}, {end}) {len(df)} строк вместо {len(test)}")
+        out["stats"] = (SuffStats(names).update(df[~test]), SuffStats(names).update(df[test]))
+    return out
+
+
+def _scan(tasks, pool):
+    """Результаты кусков по порядку; ответы на запросы суммируются по мере готовности."""
+    results = [None] * len(tasks)
+    answers = {}
+    futures = {pool.submit(_scan_range, task): i for i, task in enumerate(tasks)} if pool else None
+    done = as_completed(futures) if pool else range(len(tasks))
+    for item in done:
+        i = futures[item] if pool else item
+        res = item.result() if pool else _scan_range(tasks[i])
+        for query, answer in res.pop("answers").items():
+            if query[3]:
+                answers[query] = np.concatenate([answers[query], answer]) if query in answers else answer
+            else:
+                answers[query] = answers[query] + answer if query in answers else answer
+        results[i] = res
+    return results, answers
+
+
+def stats_chunked(path=CSV_PATH, chunk_bytes=64 * 2**20, workers=1):
+    """
+    Статистики (train, test) и медианы столбцов по CSV кусками; при workers > 1 —
+    в пуле процессов. Проход 1: число строк в каждом куске (номера строк для
+    маски train/test) и старшие 16 бит ключей для медиан. Проход 2: статистики
+    и уточнение медиан. Если в ячейке медианы слишком много значений —
+    ещё проходы, только по нужным столбцам. В памяти — кусок и гистограммы.
+    """
+    names, ranges = _chunk_ranges(path, chunk_bytes)
+    first = [(j, 0, 0, False) for j in range(len(names))]
+    with ProcessPoolExecutor(max_workers=workers) if workers > 1 else nullcontext() as pool:
+        parts, answers = _scan([(path, names, s, e, None, first) for s, e in ranges], pool)
+        search = _MedianSearch(names, [answers[q] for q in first])
+
+        bounds = np.cumsum([0] + [part["rows"] for part in parts])
+        mask = split_mask(int(bounds[-1]))
+        tasks = [(path, names, s, e, mask[bounds[i]:bounds[i + 1]], search.queries())
+                 for i, (s, e) in enumerate(ranges)]
+        parts, answers = _scan(tasks, pool)
+        search.resolve(answers)
+        while search.queries():
+            queries = search.queries()
+            _, answers = _scan([(path, names, s, e, None, queries) for s, e in ranges], pool)
+            search.resolve(answers)
+
+    train = combined(*[part["stats"][0] for part in parts])
+    test = combined(*[part["stats"][1] for part in parts])
+    return train, test, search.medians()
+
+
+def main_chunked():
+    """Шаги 1–4, 6, 7 и 10 по статистикам; графикам по точкам и шагам 8–9, 11 нужны сами строки."""
+    train, test, medians = stats_chunked(CSV_PATH, CHUNK_BYTES, STATS_WORKERS)
+    full = combined(train, test)
+    print("\nИсходные данные:", (full.n, len(full.columns)))
+
+    missing = full.missing()
+    print("\nПропуски до заполнения:\n", missing[missing > 0])
+    missing_after = missing.where(medians.isna(), 0)
+    print("\nПропуски после заполнения:\n", missing_after[missing_after > 0])
+
+    corr = corr_from(full.moments(medians))
+    draw_heatmap(corr)
+    top_features = top_from(corr)
+    print("\nТоп признаков:", top_features)
+
+    train_m, test_m = train.moments(medians), test.moments(medians)
+    for title, alpha in (("Linear Regression", 0.0), ("Ridge Regression", RIDGE_ALPHA)):
+        model = fit_from(train_m, top_features, TARGET, alpha)
+        print_scores(title, scores_from(train_m, top_features, TARGET, model),
+                     scores_from(test_m, top_features, TARGET, model))
+    # LOO нужны строки — здесь выбор alpha по GCV
+    path = ridge_path(train_m, top_features, TARGET, RIDGE_ALPHAS, test_m)
+    print_ridge_path(path)
+    draw_ridge_path(path, top_features)
+    print("\nГотово! Все графики сохранены в папку:", OUT_DIR)
+
+
+def main():
+    os.makedirs(OUT_DIR, exist_ok=True)
+    if CHUNK_BYTES:
+        main_chunked()
+        return
+
+    # ---------------------------------------------------------
+    # 1. Загрузка данных
+    # ---------------------------------------------------------
+
+    df = pd.read_csv(CSV_PATH)
+    print("\nИсходные данные:", df.shape)
+    print(df.head())
+
+    # ---------------------------------------------------------
+    # 2. Приведение типов и заполнение пропусков
+    # ---------------------------------------------------------
+
+    df = _numeric(df)
+
+    missing_before = df.isnull().sum()
+    print("\nПропуски до заполнения:\n", missing_before[missing_before > 0])
+
+    # Статистики собираются по данным с пропусками, заполнение медианами учитывается в moments
+    test_mask = split_mask(len(df))
+    train_stats = SuffStats(df.columns).update(df[~test_mask])
+    test_stats = SuffStats(df.columns).update(df[test_mask])
+    full_stats = combined(train_stats, test_stats)
+    medians = df.median()
+
+    df = df.fillna(medians)
+
+    missing_after = df.isnull().sum()
+    print("\nПропуски после заполнения:\n", missing_after[missing_after > 0])
+
+    # ---------------------------------------------------------
+    # 3. Корреляция и heatmap
+    # ---------------------------------------------------------
+
+    corr = corr_from(full_stats.moments(medians))
+    draw_heatmap(corr)
+
+    # ---------------------------------------------------------
+    # 4. Выбор 4–6 признаков с наибольшей корреляцией
+    # ---------------------------------------------------------
+
+    top_features = top_from(corr)
+
+    print("\nТоп признаков:", top_features)
+
+    # ---------------------------------------------------------
+    # 5. Scatter-plots для выбранных признаков
+    # ---------------------------------------------------------
+
+    for feat in top_features:
+        plt.figure(figsize=(6, 4))
+        plt.scatter(df[feat], df[TARGET], alpha=0.6)
+        plt.xlabel(feat)
+        plt.ylabel(TARGET)
+        plt.title(f"{feat} vs {TARGET}")
+        plt.tight_layout()
+        plt.savefig(os.path.join(OUT_DIR, f"scatter_{feat}.png"), dpi=150)
+        plt.close()
+
+    # ---------------------------------------------------------
+    # 6. Формирование выборок
+    # ---------------------------------------------------------
+
+    X = df[top_features]
+    y = df[TARGET]
 
-y_train_pred = lr.predict(X_train)
-y_test_pred = lr.predict(X_test)
+    X_train, X_test, y_train, y_test = train_test_split(
+        X, y, test_size=TEST_SIZE, shuffle=True, random_state=RANDOM_STATE
+    )
+    train_m, test_m = train_stats.moments(medians), test_stats.moments(medians)
+
+    # ---------------------------------------------------------
+    # 7. Linear Regression
+    # ---------------------------------------------------------
+
+    lr = fit_from(train_m, top_features, TARGET)
+    print_scores("Linear Regression",
+                 scores_from(train_m, top_features, TARGET, lr),
+                 scores_from(test_m, top_features, TARGET, lr))
+
+    # ---------------------------------------------------------
+    # 8. Boxplot + определение выбросов
+    # ---------------------------------------------------------
 
-def rmse(y_true, y_pred):
-    return np.sqrt(mean_squared_error(y_true, y_pred))
+    plt.figure(figsize=(6, 4))
+    plt.boxplot(df[TARGET], vert=False)
+    plt.title("Boxplot MEDV")
+    plt.tight_layout()
+    plt.savefig(os.path.join(OUT_DIR, "boxplot_MEDV.png"), dpi=150)
+    plt.close()
 
-print("\n=== Linear Regression ===")
-print("Train R2:", r2_score(y_train, y_train_pred))
-print("Test R2:", r2_score(y_test, y_test_pred))
-print("Train RMSE:", rmse(y_train, y_train_pred))
-print("Test RMSE:", rmse(y_test, y_test_pred))
+    Q1 = df[TARGET].quantile(0.25)
+    Q3 = df[TARGET].quantile(0.75)
+    IQR = Q3 - Q1
 
-# ---------------------------------------------------------
-# 8. Boxplot + определение выбросов
-# ---------------------------------------------------------
-
-plt.figure(figsize=(6, 4))
-plt.boxplot(df[TARGET], vert=False)
-plt.title("Boxplot MEDV")
-plt.tight_layout()
-plt.savefig(os.path.join(OUT_DIR, "boxplot_MEDV.png"), dpi=150)
-plt.close()
+    lower_bound = Q1 - 1.5 * IQR
+    upper_bound = Q3 + 1.5 * IQR
 
-Q1 = df[TARGET].quantile(0.25)
-Q3 = df[TARGET].quantile(0.75)
-IQR = Q3 - Q1
+    outliers = df[(df[TARGET] < lower_bound) | (df[TARGET] > upper_bound)]
+    print("\nКоличество выбросов:", len(outliers))
 
-lower_bound = Q1 - 1.5 * IQR
-upper_bound = Q3 + 1.5 * IQR
+    # ---------------------------------------------------------
+    # 9. Повторное обучение без выбросов
+    # ---------------------------------------------------------
 
-outliers = df[(df[TARGET] < lower_bound) | (df[TARGET] > upper_bound)]
-print("\nКоличество выбросов:", len(outliers))
+    df_no_out = df[(df[TARGET] >= lower_bound) & (df[TARGET] <= upper_bound)]
 
-# ---------------------------------------------------------
-# 9. Повторное обучение без выбросов
-# ---------------------------------------------------------
+    X_no = df_no_out[top_features]
+    y_no = df_no_out[TARGET]
 
-df_no_out = df[(df[TARGET] >= lower_bound) & (df[TARGET] <= upper_bound)]
+    Xtr_no, Xte_no, ytr_no, yte_no = train_test_split(
+        X_no, y_no, test_size=TEST_SIZE, random_state=RANDOM_STATE
+    )
 
-X_no = df_no_out[top_features]
-y_no = df_no_out[TARGET]
+    # Не обучение с нуля: из статистик всех строк вычитаются выбросы и новая тестовая часть
+    lr_no = LinearFit.from_moments(full_stats.moments(medians), top_features, TARGET)
+    lr_no.remove(outliers[top_features], outliers[TARGET])
+    lr_no.remove(Xte_no, yte_no)
 
-Xtr_no, Xte_no, ytr_no, yte_no = train_test_split(
-    X_no, y_no, test_size=0.2, random_state=RANDOM_STATE
-)
+    print("\n=== Linear Regression (без выбросов) ===")
+    print("Train R2:", r2_score(ytr_no, lr_no.predict(Xtr_no)))
+    print("Test R2:", r2_score(yte_no, lr_no.predict(Xte_no)))
+    print("Train RMSE:", rmse(ytr_no, lr_no.predict(Xtr_no)))
+    print("Test RMSE:", rmse(yte_no, lr_no.predict(Xte_no)))
 
-lr_no = LinearRegression()
-lr_no.fit(Xtr_no, ytr_no)
+    # ---------------------------------------------------------
+    # 10. Ridge Regression
+    # ---------------------------------------------------------
 
-print("\n=== Linear Regression (без выбросов) ===")
-print("Train R2:", r2_score(ytr_no, lr_no.predict(Xtr_no)))
-print("Test R2:", r2_score(yte_no, lr_no.predict(Xte_no)))
-print("Train RMSE:", rmse(ytr_no, lr_no.predict(Xtr_no)))
-print("Test RMSE:", rmse(yte_no, lr_no.predict(Xte_no)))
+    ridge = fit_from(train_m, top_features, TARGET, RIDGE_ALPHA)
+    print_scores("Ridge Regression",
+                 scores_from(train_m, top_features, TARGET, ridge),
+                 scores_from(test_m, top_features, TARGET, ridge))
 
-# ---------------------------------------------------------
-# 10. Ridge Regression
-# ---------------------------------------------------------
+    path = ridge_path(train_m, top_features, TARGET, RIDGE_ALPHAS, test_m)
+    path["loo"] = ridge_loo(X_train, y_train, RIDGE_ALPHAS)
+    print_ridge_path(path)
+    draw_ridge_path(path, top_features)
 
-ridge = Ridge(alpha=1.0)
-ridge.fit(X_train, y_train)
+    # ---------------------------------------------------------
+    # 11. Polynomial Regression (degree=3)
+    # ---------------------------------------------------------
 
-print("\n=== Ridge Regression ===")
-print("Train R2:", r2_score(y_train, ridge.predict(X_train)))
-print("Test R2:", r2_score(y_test, ridge.predict(X_test)))
-print("Train RMSE:", rmse(y_train, ridge.predict(X_train)))
-print("Test RMSE:", rmse(y_test, ridge.predict(X_test)))
+    poly_model = Pipeline([
+        ("poly", PolynomialFeatures(degree=3, include_bias=False)),
+        ("scaler", StandardScaler()),
+        ("lr", LinearRegression())
+    ])
 
-# ---------------------------------------------------------
-# 11. Polynomial Regression (degree=3)
-# ---------------------------------------------------------
+    poly_model.fit(X_train, y_train)
 
-poly_model = Pipeline([
-    ("poly", PolynomialFeatures(degree=3, include_bias=False)),
-    ("scaler", StandardScaler()),
-    ("lr", LinearRegression())
-])
+    print("\n=== Polynomial Regression (deg=3) ===")
+    print("Train R2:", r2_score(y_train, poly_model.predict(X_train)))
+    print("Test R2:", r2_score(y_test, poly_model.predict(X_test)))
+    print("Train RMSE:", rmse(y_train, poly_model.predict(X_train)))
+    print("Test RMSE:", rmse(y_test, poly_model.predict(X_test)))
 
-poly_model.fit(X_train, y_train)
+    print("\nГотово! Все графики сохранены в папку:", OUT_DIR)
 
-print("\n=== Polynomial Regression (deg=3) ===")
-print("Train R2:", r2_score(y_train, poly_model.predict(X_train)))
-print("Test R2:", r2_score(y_test, poly_model.predict(X_test)))
-print("Train RMSE:", rmse(y_train, poly_model.predict(X_train)))
-print("Test RMSE:", rmse(y_test, poly_model.predict(X_test)))
 
-print("\nГотово! Все графики сохранены в папку:", OUT_DIR)
+if __name__ == "__main__":
+    main()